@@ -0,0 +1,117 @@
+"""
+NumPy array output for the PRNGs (needs NumPy, imported on first use)
+
+Mixin for any generator with a readinto method: the stream is written
+straight into the array's memory, no intermediate bytes objects.
+
+    prng.random_array(shape, dtype="float64", low=None, high=None)   # new array
+    prng.fill_array(out, low=None, high=None)                        # in place
+
+dtype / out.dtype:
+    unsigned and signed integers (8 to 64 bits): the raw stream bytes in
+        native byte order, or uniform in [low, high) when bounds are given
+    float64: uniform in [0, 1), the top 53 bits of each 64-bit word
+    float32: uniform in [0, 1), the top 24 bits of each 32-bit word
+
+Bounded integers: each element is one word of the dtype's width masked to
+the bit length of high - low; elements at or above high - low are drawn
+again, in order, from the following bytes of the stream (fewer than 2
+words per element on average).
+"""
+
+
+# Elements converted per step from words to floats
+CONVERT_CHUNK = 1 << 16
+
+
+"""
+Import NumPy, with a clear error when it is not installed
+"""
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Array output requires NumPy.") from None
+    return numpy
+
+
+class ArrayOutput:
+
+    def random_array(self, shape, dtype="float64", low=None, high=None):
+        """
+        Return a new array of the given shape and dtype filled from the
+        stream (see fill_array)
+        """
+        np = _numpy()
+        return self.fill_array(np.empty(shape, dtype=dtype), low, high)
+
+    def fill_array(self, out, low=None, high=None):
+        """
+        Fill a writable C-contiguous array in place from the stream.
+        Integer arrays: raw bits, or uniform in [low, high) when both are given.
+        Float arrays: uniform in [0, 1).
+        Returns out.
+        """
+        np = _numpy()
+        if not out.flags.c_contiguous or not out.flags.writeable:
+            raise ValueError("out must be a writable C-contiguous array.")
+        dtype = out.dtype
+        flat = out.reshape(-1)
+
+        if dtype.kind == "f":
+            if low is not None or high is not None:
+                raise ValueError("low and high only apply to integer arrays.")
+            if dtype.itemsize == 8:
+                bits, words = 53, flat.view(np.uint64)
+            elif dtype.itemsize == 4:
+                bits, words = 24, flat.view(np.uint32)
+            else:
+                raise ValueError(f"Unsupported float dtype {dtype}, use float32 or float64.")
+            self.readinto(words)
+            words >>= words.dtype.type(8 * dtype.itemsize - bits)
+            # Converted in place, each word becomes the float at the same
+            # position. NumPy copies overlapping operands first, so convert
+            # in slices to keep that copy small.
+            for start in range(0, len(flat), CONVERT_CHUNK):
+                end = start + CONVERT_CHUNK
+                np.multiply(words[start:end], 2.0 ** -bits, out=flat[start:end], casting="unsafe")
+            return out
+
+        if dtype.kind not in "ui":
+            raise ValueError(f"Unsupported dtype {dtype}, use an integer or float dtype.")
+        words = flat.view(np.dtype(f"u{dtype.itemsize}"))
+        if low is None and high is None:
+            self.readinto(words)
+            return out
+        if low is None or high is None:
+            raise ValueError("Give both low and high for bounded integers.")
+
+        info = np.iinfo(dtype)
+        if not info.min <= low < high <= info.max + 1:
+            raise ValueError(f"Need {info.min} <= low < high <= {info.max + 1} for {dtype}.")
+        self._fill_bounded(np, words, high - low)
+        # Wrapping unsigned addition, correct for signed dtypes viewed as unsigned
+        words += words.dtype.type(low % (1 << (8 * dtype.itemsize)))
+        return out
+
+    """
+    Fill words (unsigned array) with uniform values in [0, span) by masked
+    rejection sampling
+    """
+    def _fill_bounded(self, np, words, span):
+        self.readinto(words)
+        if span == 1 << (8 * words.dtype.itemsize):
+            return
+        wtype = words.dtype.type
+        mask = wtype((1 << (span - 1).bit_length()) - 1)
+        words &= mask
+        rejected = np.flatnonzero(words >= wtype(span))
+
+        # Redraw rejected elements in order, one candidate each per round
+        while rejected.size:
+            candidates = np.empty(rejected.size, dtype=words.dtype)
+            self.readinto(candidates)
+            candidates &= mask
+            accepted = candidates < wtype(span)
+            words[rejected[accepted]] = candidates[accepted]
+            rejected = rejected[~accepted]
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+import os
+import sys
+import math
+import json
+import time
+import secrets
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+Non-interactive batch runner for the PRNGs
+
+Reads a manifest (JSON or TOML) listing generation jobs, runs them
+concurrently in a process pool and writes a consolidated JSON report with
+timings and parameters of every job. Output is streamed to disk with
+iter_chunks, so a worker's memory does not grow with the job size; an
+optional address space limit per worker can be set on top.
+
+Manifest: either a list of jobs or {"workers": ..., "output_dir": ...,
+"memory_limit_mb": ..., "jobs": [...]}. Job fields:
+    prng: "chacha" or "bbs"
+    bits: number of bits to generate
+    name: base name of the output files (default: <prng>_<index>)
+    outputs: formats from output.SINKS, default ["bin", "digest"]
+    chunk_bytes: chunk size passed to iter_chunks (optional)
+    stats: true to record the PRNG's instrumentation counters and timers
+        in the report (see instrumentation.py)
+  chacha:
+    key, nonce: hex strings (default: random), counter (default: 1)
+  bbs:
+    p, q: explicit primes, or prime_size: bit size of generated primes
+    seed: default random, coprime with p*q
+    bits_per_step, use_crt, backend: see BlumBlumShubPRNG
+"""
+
+DEFAULT_OUTPUT_DIR = "batch_output"
+DEFAULT_OUTPUTS = ["bin", "digest"]
+# File extension of each output format
+EXTENSIONS = {"bin": ".bin", "hex": ".hex", "text": ".txt"}
+
+
+def load_manifest(path):
+    """
+    Read a JSON or TOML manifest, return it as a dict with a "jobs" list
+    """
+    if path.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        with open(path, "rb") as f:
+            manifest = tomllib.load(f)
+    else:
+        with open(path) as f:
+            manifest = json.load(f)
+
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+    if not manifest.get("jobs"):
+        raise ValueError("Manifest contains no jobs.")
+    for index, job in enumerate(manifest["jobs"]):
+        if job.get("prng") not in ("chacha", "bbs"):
+            raise ValueError(f"Job {index}: prng must be 'chacha' or 'bbs'.")
+        if not isinstance(job.get("bits"), int) or job["bits"] < 0:
+            raise ValueError(f"Job {index}: bits must be a non-negative integer.")
+        for kind in job.get("outputs", DEFAULT_OUTPUTS):
+            if kind not in EXTENSIONS and kind != "digest":
+                raise ValueError(f"Job {index}: unknown output format '{kind}', choose from bin, hex, text, digest.")
+        job.setdefault("name", f"{job['prng']}_{index}")
+    return manifest
+
+
+"""
+Build the ChaCha20 PRNG of a job, return (prng, parameters for the report)
+"""
+def _make_chacha(job):
+    from chacha20 import ChaChaPRNG
+
+    key = bytes.fromhex(job["key"]) if "key" in job else secrets.token_bytes(32)
+    nonce = bytes.fromhex(job["nonce"]) if "nonce" in job else secrets.token_bytes(12)
+    counter = job.get("counter", 1)
+    prng = ChaChaPRNG(key, nonce, counter)
+    return prng, {"key": key.hex(), "nonce": nonce.hex(), "counter": counter}
+
+
+"""
+Build the BBS PRNG of a job, return (prng, parameters for the report)
+"""
+def _make_bbs(job):
+    from bbs import BlumBlumShubPRNG
+
+    if "p" in job and "q" in job:
+        p, q = int(job["p"]), int(job["q"])
+    else:
+        from prime_pool import take_blum_prime
+        # No background refill from inside pool workers
+        p = take_blum_prime(job.get("prime_size", 512), refill_to=0)
+        q = take_blum_prime(job.get("prime_size", 512), refill_to=0)
+
+    n = p * q
+    if "seed" in job:
+        seed = int(job["seed"])
+    else:
+        seed = secrets.randbelow(n - 2) + 2
+        while math.gcd(seed, n) != 1:
+            seed = secrets.randbelow(n - 2) + 2
+
+    prng = BlumBlumShubPRNG(p, q, seed, use_crt=job.get("use_crt", False),
+                            bits_per_step=job.get("bits_per_step", 1),
+                            backend=job.get("backend"))
+    parameters = {"p": str(p), "q": str(q), "seed": str(seed),
+                  "bits_per_step": prng.bits_per_step, "use_crt": prng.use_crt,
+                  "backend": prng.backend.name}
+    return prng, parameters
+
+
+def run_job(job, output_dir):
+    """
+    Run one job, streaming its output to the requested formats.
+    Returns the job's report entry.
+    """
+    from output import DigestSink, make_sink, write_stream
+
+    wall_start = time.perf_counter()
+    if job["prng"] == "chacha":
+        prng, parameters = _make_chacha(job)
+    else:
+        prng, parameters = _make_bbs(job)
+    setup = time.perf_counter() - wall_start
+    if job.get("stats"):
+        prng.enable_stats()
+
+    # The digest is always computed for the report
+    digest = DigestSink()
+    sinks = [digest]
+    files = {}
+    for kind in job.get("outputs", DEFAULT_OUTPUTS):
+        if kind == "digest":
+            continue
+        path = os.path.join(output_dir, job["name"] + EXTENSIONS[kind])
+        sinks.append(make_sink(kind, path))
+        files[kind] = path
+
+    chunk_args = (job["chunk_bytes"],) if "chunk_bytes" in job else ()
+    duration = write_stream(prng.iter_chunks(job["bits"], *chunk_args), job["bits"], sinks)
+
+    wall = time.perf_counter() - wall_start
+    result = {
+        "name": job["name"],
+        "prng": job["prng"],
+        "bits": job["bits"],
+        "parameters": parameters,
+        "files": files,
+        "sha256": digest.hexdigest(),
+        "setup_seconds": setup,
+        "generation_seconds": duration,
+        "wall_seconds": wall,
+        "throughput_mb_s": job["bits"] / 8 / 1e6 / duration if duration > 0 else None,
+        "worker_pid": os.getpid(),
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+    if job.get("stats"):
+        result["stats"] = prng.stats()
+    return result
+
+
+"""
+Peak resident memory of this process in KB (None where unavailable)
+"""
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, KB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+"""
+Pool initializer: cap the address space of a worker (POSIX only)
+"""
+def _limit_memory(memory_limit_mb):
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+"""
+Worker wrapper: run a job and turn failures into report entries
+"""
+def _run_job_safe(job, output_dir):
+    try:
+        return run_job(job, output_dir)
+    except Exception as e:
+        return {"name": job["name"], "prng": job["prng"], "bits": job["bits"],
+                "error": f"{type(e).__name__}: {e}"}
+
+
+def run_manifest(manifest, output_dir=None, workers=None, memory_limit_mb=None):
+    """
+    Run all jobs of a manifest (see load_manifest) in a process pool.
+    Arguments override the manifest settings.
+    Returns the consolidated report as a dict.
+    """
+    output_dir = output_dir or manifest.get("output_dir", DEFAULT_OUTPUT_DIR)
+    workers = workers or manifest.get("workers") or os.cpu_count() or 1
+    memory_limit_mb = memory_limit_mb or manifest.get("memory_limit_mb")
+    jobs = manifest["jobs"]
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                             initializer=_limit_memory, initargs=(memory_limit_mb,)) as pool:
+        results = list(pool.map(_run_job_safe, jobs, [output_dir] * len(jobs)))
+    total = time.perf_counter() - start
+
+    return {
+        "output_dir": output_dir,
+        "workers": min(workers, len(jobs)),
+        "memory_limit_mb": memory_limit_mb,
+        "total_wall_seconds": total,
+        "failed": sum(1 for r in results if "error" in r),
+        "jobs": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run PRNG generation jobs from a manifest")
+    parser.add_argument("manifest", help="JSON or TOML manifest of jobs")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: manifest or CPU count)")
+    parser.add_argument("--output-dir", type=str, default=None, help=f"Output directory (default: manifest or {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument("--memory-limit-mb", type=int, default=None, help="Address space limit per worker in MB")
+    parser.add_argument("--report", type=str, default=None, help="Report path (default: <output_dir>/report.json)")
+    parser.add_argument("--stats", action="store_true", help="Record instrumentation stats for every job")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
+    if args.stats:
+        for job in manifest["jobs"]:
+            job.setdefault("stats", True)
+    report = run_manifest(manifest, args.output_dir, args.workers, args.memory_limit_mb)
+
+    report_path = args.report or os.path.join(report["output_dir"], "report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for job in report["jobs"]:
+        if "error" in job:
+            print(f"{job['name']}: FAILED ({job['error']})")
+        else:
+            print(f"{job['name']}: {job['bits']} bits in {job['generation_seconds']:.4f} s, sha256 {job['sha256'][:16]}...")
+    print(f"\n{len(report['jobs'])} jobs in {report['total_wall_seconds']:.2f} s, report saved to {report_path}")
+    sys.exit(1 if report["failed"] else 0)
+
+
+if __name__ == '__main__':
+    main()
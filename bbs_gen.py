@@ -2,9 +2,9 @@ import os
 import math
 import secrets
 import time
-from bitstring import BitArray
 from bbs import BlumBlumShubPRNG
 from primes import generate_blum_prime
+from output import BinarySink, BitTextSink, DigestSink, write_stream, write_info_digest, read_uint, write_hex
 
 def generate_valid_seed(p, q):
     """
@@ -26,6 +26,9 @@ def main():
         print("Invalid input. Please enter an integer value for the number of bits.")
         exit(1)
 
+    full_info_input = input("Write the full integer and hex value to the info file? (Y/N): ").strip().lower()
+    full_info = full_info_input in ["y", "yes"]
+
     # --- Default values for BBS ---
     default_p = 499       # Must be ≡ 3 mod 4.
     default_q = 547       # Must be ≡ 3 mod 4.
@@ -85,11 +88,6 @@ def main():
 
     # --- Generate BBS Output ---
     bbs_prng = BlumBlumShubPRNG(p, q, seed)
-    start_time = time.perf_counter()
-    bbs_bits = bbs_prng.generate_bits(num_bits)
-    end_time = time.perf_counter()
-    duration = end_time - start_time
-    print(f"BBS: Generated {num_bits} bits in {duration:.4f} seconds.")
 
     # Create output directory if it doesn't exist
     output_dir = "bbs_output"
@@ -97,26 +95,28 @@ def main():
 
     prng_name = input("Name your BBS: ").strip()
 
-    # Save binary output
+    # Generate and save binary and bit string output chunk by chunk
     bbs_bin_filename = f"{prng_name}_output.bin"
     bbs_bin_path = os.path.join(output_dir, bbs_bin_filename)
-    with open(bbs_bin_path, "wb") as f:
-        f.write(bbs_bits.tobytes())
-    print(f"BBS binary output saved to {bbs_bin_filename}")
-
-    # Save bit string output
     bbs_txt_filename = f"{prng_name}_output.txt"
     bbs_txt_path = os.path.join(output_dir, bbs_txt_filename)
-    with open(bbs_txt_path, "w") as f:
-        f.write(bbs_bits.bin)
+    bbs_digest = DigestSink()
+    duration = write_stream(bbs_prng.iter_chunks(num_bits), num_bits, [BinarySink(bbs_bin_path), BitTextSink(bbs_txt_path), bbs_digest])
+    print(f"BBS: Generated {num_bits} bits in {duration:.4f} seconds.")
+    print(f"BBS binary output saved to {bbs_bin_filename}")
     print(f"BBS bit string output saved to {bbs_txt_filename}")
 
     # --- Save PRNG information to an info file ---
     info_filename = f"{prng_name}_info.txt"
     info_path = os.path.join(output_dir, info_filename)
     with open(info_path, "w") as f:
-        f.write(f"PRNG integer value: {bbs_bits.uint}\n")
-        f.write(f"PRNG hex value: {bbs_bits.hex}\n")
+        write_info_digest(f, bbs_digest)
+        # Full values grow super-linearly with the sample size, only on request
+        if full_info:
+            f.write(f"PRNG integer value: {read_uint(bbs_bin_path, num_bits)}\n")
+            f.write("PRNG hex value: ")
+            write_hex(f, bbs_bin_path, num_bits)
+            f.write("\n")
         # Secrets
         f.write(f"p: {p}\n")
         f.write(f"q: {q}\n")
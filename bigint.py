@@ -0,0 +1,82 @@
+import os
+
+"""
+Big integer arithmetic backends used by bbs.py and primes.py
+
+gmpy2: GMP mpz arithmetic and primality tests, used when installed
+python: built-in ints, with sympy for primality tests
+
+Select a backend with the backend parameter of BlumBlumShubPRNG /
+generate_blum_prime, or the PRNG_BIGINT_BACKEND environment variable
+("auto", "gmpy2" or "python"). "auto" (the default) picks gmpy2 when it
+is installed. Both backends produce identical results.
+"""
+
+ENV_VAR = "PRNG_BIGINT_BACKEND"
+
+
+class PythonBackend:
+    name = "python"
+
+    def mpz(self, x):
+        return int(x)
+
+    def is_prime(self, x):
+        from sympy import isprime
+        return isprime(x)
+
+    def next_prime(self, x):
+        """
+        Smallest prime greater than x
+        """
+        from sympy import nextprime
+        return nextprime(x)
+
+
+class Gmpy2Backend:
+    name = "gmpy2"
+
+    def __init__(self):
+        import gmpy2
+        self._gmpy2 = gmpy2
+
+    def mpz(self, x):
+        return self._gmpy2.mpz(x)
+
+    def is_prime(self, x):
+        return bool(self._gmpy2.is_prime(x))
+
+    def next_prime(self, x):
+        """
+        Smallest prime greater than x
+        """
+        return int(self._gmpy2.next_prime(x))
+
+
+BACKENDS = {
+    "python": PythonBackend,
+    "gmpy2": Gmpy2Backend,
+}
+
+# One instance per backend name
+_instances = {}
+
+
+def get_backend(name=None):
+    """
+    Return the arithmetic backend called name ("auto", "gmpy2", "python").
+    name: None reads PRNG_BIGINT_BACKEND, defaulting to "auto"
+    """
+    if name is None:
+        name = os.environ.get(ENV_VAR, "auto")
+    name = name.lower()
+    if name == "auto":
+        try:
+            return get_backend("gmpy2")
+        except ImportError:
+            return get_backend("python")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown big integer backend '{name}', choose from auto, {', '.join(BACKENDS)}.")
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
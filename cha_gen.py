@@ -2,8 +2,8 @@
 import os
 import time
 import secrets
-from bitstring import BitArray
 from chacha20 import ChaChaPRNG
+from output import BinarySink, BitTextSink, DigestSink, write_stream, write_info_digest, read_uint, write_hex
 
 def main():
     # --- Get Number of Bits ---
@@ -14,6 +14,9 @@ def main():
         print("Invalid input. Please enter an integer value for the number of bits.")
         exit(1)
 
+    full_info_input = input("Write the full integer and hex value to the info file? (Y/N): ").strip().lower()
+    full_info = full_info_input in ["y", "yes"]
+
     # --- Generate ChaCha20 Key and Nonce ---
     key = secrets.token_bytes(32)
     nonce = secrets.token_bytes(12)
@@ -21,30 +24,22 @@ def main():
     # Initialize ChaCha20 PRNG
     cha_prng = ChaChaPRNG(key, nonce)
 
-    start_time = time.perf_counter()
-    cha_bits = cha_prng.generate_bits(num_bits)
-    end_time = time.perf_counter()
-    duration = end_time - start_time
-    print(f"ChaCha20: Generated {num_bits} bits in {duration:.4f} seconds.")
-
     prng_name = input("Name your ChaCha: ").strip()
 
     # Create output directory if it doesn't exist
     output_dir = "chacha_output"
     os.makedirs(output_dir, exist_ok=True)
 
-    # Save binary output using user-defined base name
+    # Generate and save binary and bit string output chunk by chunk,
+    # using user-defined base name
     cha_bin_filename = f"{prng_name}_output.bin"
     cha_bin_path = os.path.join(output_dir, cha_bin_filename)
-    with open(cha_bin_path, "wb") as f:
-        f.write(cha_bits.tobytes())
-    print(f"ChaCha20 binary output saved to {cha_bin_filename}")
-
-    # Save bit string output using user-defined base name
     cha_txt_filename = f"{prng_name}_output.txt"
     cha_txt_path = os.path.join(output_dir, cha_txt_filename)
-    with open(cha_txt_path, "w") as f:
-        f.write(cha_bits.bin)
+    cha_digest = DigestSink()
+    duration = write_stream(cha_prng.iter_chunks(num_bits), num_bits, [BinarySink(cha_bin_path), BitTextSink(cha_txt_path), cha_digest])
+    print(f"ChaCha20: Generated {num_bits} bits in {duration:.4f} seconds.")
+    print(f"ChaCha20 binary output saved to {cha_bin_filename}")
     print(f"ChaCha20 bit string output saved to {cha_txt_filename}")
 
 
@@ -61,8 +56,13 @@ def main():
     info_filename = f"{prng_name}_info.txt"
     info_path = os.path.join(output_dir, info_filename)
     with open(info_path, "w") as f:
-        f.write(f"PRNG integer value: {cha_bits.uint}\n")
-        f.write(f"PRNG hex value: {cha_bits.hex}\n")
+        write_info_digest(f, cha_digest)
+        # Full values grow super-linearly with the sample size, only on request
+        if full_info:
+            f.write(f"PRNG integer value: {read_uint(cha_bin_path, num_bits)}\n")
+            f.write("PRNG hex value: ")
+            write_hex(f, cha_bin_path, num_bits)
+            f.write("\n")
         f.write(f"Key integer value: {key_int}\n")
         f.write(f"Key hex value: {key.hex()}\n")
         f.write(f"Constant int value: {c_int}\n")
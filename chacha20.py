@@ -1,11 +1,52 @@
 import math
+import time
 import struct
-import secrets
-from bitstring import BitArray
+from instrumentation import Instrumented
+from array_output import ArrayOutput
+
+# NumPy is optional: when available, keystream blocks are computed in batches.
+# It is only imported on first use (see load_numpy) to keep imports fast.
+np = None
+_numpy_loaded = False
+
+def load_numpy():
+    """
+    Import NumPy the first time it is needed.
+    Returns the module, or None when NumPy is not installed.
+    """
+    global np, _numpy_loaded
+    if not _numpy_loaded:
+        _numpy_loaded = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
+
+def numpy_available():
+    """
+    Whether NumPy can be imported, without importing it
+    """
+    if _numpy_loaded:
+        return np is not None
+    import importlib.util
+    return importlib.util.find_spec("numpy") is not None
 
 # "expand 32-byte k"
 constants = [0x61707865, 0x3320646e, 0x79622d32, 0x6b206574]
 
+# Number of blocks computed per refill by the vectorized engine
+NUMPY_BATCH_BLOCKS = 4096
+# Number of blocks computed per refill by the pure Python engine
+PYTHON_BATCH_BLOCKS = 16
+# Below this many blocks the per-call overhead of the vectorized engine
+# exceeds the pure Python block function (seeks, short ranges)
+NUMPY_MIN_BLOCKS = 8
+
+# Default chunk size of iter_chunks
+DEFAULT_CHUNK_BYTES = 1 << 20
+
 """
 Rotation function for rotating bits
 v: 32 bit block (chacha inner block size)
@@ -54,7 +95,18 @@ def chacha20_block(k, c, n):
     k_bits = list(struct.unpack('<8L', k))
     n_bits = list(struct.unpack('<3L', n))
 
-    initial_state = constants + k_bits + [c] + n_bits
+    return chacha20_block_words(k_bits, c, n_bits)
+
+"""
+Same as chacha20_block, but takes the key and nonce already unpacked
+k_words: list of 8 little endian key words
+c: counter
+n_words: list of 3 little endian nonce words
+
+return: 512 pseudorandom bits
+"""
+def chacha20_block_words(k_words, c, n_words):
+    initial_state = constants + k_words + [c] + n_words
     current_state = initial_state.copy()
 
     # Do 20 quarter rounds [10 column, 10 diagonal]
@@ -79,51 +131,296 @@ def chacha20_block(k, c, n):
     
     return bytes
 
+"""
+Vectorized version of quarter_round
+state: 16 x N uint32 array, one column per block
+a,b,c,d : indicate which rows to operate on
+"""
+def quarter_round_vec(state, a, b, c, d):
+    # uint32 arithmetic wraps around, so no masking is needed
+    state[a] += state[b]
+    state[d] ^= state[a]
+    state[d] = (state[d] << 16) | (state[d] >> 16)
+
+    state[c] += state[d]
+    state[b] ^= state[c]
+    state[b] = (state[b] << 12) | (state[b] >> 20)
+
+    state[a] += state[b]
+    state[d] ^= state[a]
+    state[d] = (state[d] << 8) | (state[d] >> 24)
+
+    state[c] += state[d]
+    state[b] ^= state[c]
+    state[b] = (state[b] << 7) | (state[b] >> 25)
+
+"""
+Function to generate several consecutive 512 bit blocks at once (needs NumPy)
+k: 256 bit key (as bytes)
+c: counter of the first block
+n: 96 bit nonce (as bytes)
+num_blocks: number of blocks to generate
+out: optional writable buffer of num_blocks * 64 bytes to write the blocks into
+
+return: num_blocks * 512 pseudorandom bits, the same bytes as
+    chacha20_block(k, c, n) + chacha20_block(k, c + 1, n) + ...
+    (None when out is given)
+"""
+def chacha20_blocks(k, c, n, num_blocks, out=None):
+    if load_numpy() is None:
+        raise RuntimeError("chacha20_blocks requires NumPy.")
+
+    return chacha20_blocks_words(state_template(k, n), c, num_blocks, out)
+
+"""
+Build the 16 word input state shared by every block of a key/nonce pair
+(needs NumPy). The counter word is left as 0 and filled in per block.
+k: 256 bit key (as bytes)
+n: 96 bit nonce (as bytes)
+"""
+def state_template(k, n):
+    template = np.zeros(16, dtype=np.uint32)
+    template[0:4] = constants
+    template[4:12] = np.frombuffer(k, dtype='<u4')
+    template[13:16] = np.frombuffer(n, dtype='<u4')
+    return template
+
+"""
+Same as chacha20_blocks, but takes the precomputed state_template
+"""
+def chacha20_blocks_words(template, c, num_blocks, out=None):
+    # One column per block, all columns share the constants, key and nonce
+    initial_state = np.empty((16, num_blocks), dtype=np.uint32)
+    initial_state[:] = template[:, None]
+    initial_state[12] = np.arange(c, c + num_blocks, dtype=np.uint64).astype(np.uint32)
+    current_state = initial_state.copy()
+
+    # Do 20 quarter rounds [10 column, 10 diagonal] on every block
+    for i in range(10):
+        # Columns
+        quarter_round_vec(current_state, 0, 4, 8, 12)
+        quarter_round_vec(current_state, 1, 5, 9, 13)
+        quarter_round_vec(current_state, 2, 6, 10, 14)
+        quarter_round_vec(current_state, 3, 7, 11, 15)
+        # Diags
+        quarter_round_vec(current_state, 0, 5, 10, 15)
+        quarter_round_vec(current_state, 1, 6, 11, 12)
+        quarter_round_vec(current_state, 2, 7, 8, 13)
+        quarter_round_vec(current_state, 3, 4, 9, 14)
+
+    # Mix state
+    current_state += initial_state
+
+    # Blocks are laid out one after another, words in little endian order
+    if out is None:
+        return current_state.T.astype('<u4').tobytes()
+    np.frombuffer(out, dtype='<u4').reshape(num_blocks, 16)[:] = current_state.T
+
 """
 Our ChaCha20 PRNG
 Key length: 256 bits
 Nonce: 96 bits
 Generates 512 bit keystreams. Use functions generate_bits/generate_bytes
-    to return output desired amount of bits/bytes
+    to return output desired amount of bits/bytes, or readinto to fill
+    an existing buffer
+blocks_per_refill: number of blocks generated each time the internal
+    buffer runs out (defaults to NUMPY_BATCH_BLOCKS with NumPy,
+    PYTHON_BATCH_BLOCKS without)
+enable_stats / stats: opt-in counters and timers (see instrumentation.py)
+random_array / fill_array: NumPy arrays of integers or floats generated in
+    place (see array_output.py)
 """
-class ChaChaPRNG:
-    def __init__(self, key, nonce, counter=1):
+class ChaChaPRNG(Instrumented, ArrayOutput):
+    def __init__(self, key, nonce, counter=1, blocks_per_refill=None):
         if len(key) != 32:
             raise ValueError("Key must be 32 bytes long.")
         if len(nonce) != 12:
             raise ValueError("Nonce must be 12 bytes long.")
+        if blocks_per_refill is None:
+            blocks_per_refill = NUMPY_BATCH_BLOCKS if numpy_available() else PYTHON_BATCH_BLOCKS
+        if blocks_per_refill < 1:
+            raise ValueError("blocks_per_refill must be at least 1.")
         self.key = key
         self.nonce = nonce
         self.counter = counter
+        # Counter of the first block of the stream, byte 0 for seek/tell
+        self.start_counter = counter
+        self.blocks_per_refill = blocks_per_refill
+
+        # Key and nonce words only need to be unpacked once per instance.
+        self._key_words = list(struct.unpack('<8L', key))
+        self._nonce_words = list(struct.unpack('<3L', nonce))
+        # Built with NumPy by the first run of NUMPY_MIN_BLOCKS blocks
+        self._template = None
 
         # Internal buffer for block bytes and pointer to the next unread byte.
-        self.buffer = b""
-        self.buffer_offset = 0
+        # The buffer starts out fully consumed.
+        self.buffer = bytearray(64 * blocks_per_refill)
+        self._buffer_view = memoryview(self.buffer)
+        self.buffer_offset = len(self.buffer)
+        # Start of the valid bytes in the buffer (single block refills only
+        # fill its end)
+        self._valid_from = len(self.buffer)
+        # Blocks of the next refill: the first refills are kept below
+        # NUMPY_MIN_BLOCKS, so a short run never imports NumPy
+        self._refill_blocks = 1
 
     """
-    Generate a new 64-byte block of pseudorandom data.
+    Write num_blocks blocks starting at block counter into out
+    (a writable byte buffer of num_blocks * 64 bytes), at most
+    blocks_per_refill blocks per batch. The position is not changed.
     """
-    def _refill(self):
-        self.buffer = chacha20_block(self.key, self.counter, self.nonce)
-        self.counter += 1
-        self.buffer_offset = 0
+    def _blocks_at(self, counter, out, num_blocks):
+        stats = self._stats
+        if stats is not None:
+            start = time.perf_counter()
+        if num_blocks >= NUMPY_MIN_BLOCKS and self._numpy_template() is not None:
+            for first in range(0, num_blocks, self.blocks_per_refill):
+                count = min(self.blocks_per_refill, num_blocks - first)
+                chacha20_blocks_words(self._template, counter + first, count,
+                                      out[64 * first:64 * (first + count)])
+        else:
+            for i in range(num_blocks):
+                block = chacha20_block_words(self._key_words, counter + i, self._nonce_words)
+                out[64 * i:64 * (i + 1)] = block
+        if stats is not None:
+            stats.add_time("keystream", time.perf_counter() - start)
+            stats.count("blocks", num_blocks)
 
-    
-    def generate_bytes(self, n):
+    """
+    Precomputed NumPy state of this key and nonce, None without NumPy
+    """
+    def _numpy_template(self):
+        if self._template is None and load_numpy() is not None:
+            self._template = state_template(self.key, self.nonce)
+        return self._template
+
+    """
+    Write num_blocks blocks starting at self.counter into out
+    (a writable byte buffer of num_blocks * 64 bytes) and advance the counter.
+    """
+    def _blocks_into(self, out, num_blocks):
+        self._blocks_at(self.counter, out, num_blocks)
+        self.counter += num_blocks
+
+    """
+    Generate the next num_blocks blocks into the end of the internal buffer.
+    num_blocks=None: a full buffer of blocks_per_refill blocks, after 1, 2
+    and 4 blocks for the first refills (below NUMPY_MIN_BLOCKS), so small
+    runs neither import NumPy nor compute a whole buffer. A seek or the
+    tail of a large read only needs one block.
+    """
+    def _refill(self, num_blocks=None):
+        if num_blocks is None:
+            num_blocks = min(self._refill_blocks, self.blocks_per_refill)
+            if 2 * self._refill_blocks < NUMPY_MIN_BLOCKS:
+                self._refill_blocks *= 2
+            else:
+                self._refill_blocks = self.blocks_per_refill
+        start = len(self.buffer) - 64 * num_blocks
+        self._blocks_into(self._buffer_view[start:], num_blocks)
+        self.buffer_offset = start
+        self._valid_from = start
+        if self._stats is not None:
+            self._stats.count("refills")
+
+    def readinto(self, buffer):
         """
-        Return n pseudorandom bytes.
+        Fill a writable buffer (bytearray, memoryview, ...) with pseudorandom
+        bytes, continuing the stream. Whole blocks are written straight into
+        the buffer.
+        Returns the number of bytes written.
         """
-        result = bytearray()
-        while n > 0:
-            if self.buffer_offset >= len(self.buffer):
-                self._refill()
-            available = len(self.buffer) - self.buffer_offset
+        view = memoryview(buffer).cast('B')
+        n = len(view)
+        pos = 0
+
+        # Serve what is left of the internal buffer first
+        available = len(self.buffer) - self.buffer_offset
+        if available > 0:
             take = min(n, available)
-            result.extend(self.buffer[self.buffer_offset:self.buffer_offset+take])
+            view[:take] = self._buffer_view[self.buffer_offset:self.buffer_offset + take]
             self.buffer_offset += take
-            n -= take
+            pos = take
+
+        # Generate whole blocks directly into the caller's buffer
+        while n - pos >= 64:
+            num_blocks = min((n - pos) // 64, self.blocks_per_refill)
+            end = pos + 64 * num_blocks
+            self._blocks_into(view[pos:end], num_blocks)
+            pos = end
+
+        # Remaining partial block comes from the internal buffer: a refill
+        # for small reads (later small reads use it), only the one block
+        # needed after a large read
+        if pos < n:
+            self._refill(1 if pos > available else None)
+            take = n - pos
+            view[pos:] = self._buffer_view[self.buffer_offset:self.buffer_offset + take]
+            self.buffer_offset += take
+
+        stats = self._stats
+        if stats is not None:
+            stats.count("readinto_calls")
+            stats.count("bytes_out", n)
+            direct = 64 * ((n - min(n, available)) // 64)
+            stats.count("bytes_direct", direct)
+            stats.count("bytes_copied", n - direct)
+            stats.emit("readinto")
+        return n
+
+    def generate_bytes(self, n):
+        """
+        Return n pseudorandom bytes.
+        """
+        result = bytearray(n)
+        self.readinto(result)
         return bytes(result)
     
+    def tell(self):
+        """
+        Return the current position in the keystream, in bytes from the start.
+        """
+        unread = len(self.buffer) - self.buffer_offset
+        return (self.counter - self.start_counter) * 64 - unread
+
+    def seek(self, byte_offset):
+        """
+        Move to byte_offset in the keystream. Since every block only depends on
+        its counter, this costs at most one block whatever the offset.
+        byte_offset: position in bytes from the start of the stream
+        """
+        if byte_offset < 0:
+            raise ValueError("Offset must be non-negative.")
+
+        # Target already in the internal buffer: just move the pointer
+        buffer_start = self.tell() - self.buffer_offset
+        if (self.buffer_offset < len(self.buffer)
+                and buffer_start + self._valid_from <= byte_offset < buffer_start + len(self.buffer)):
+            self.buffer_offset = byte_offset - buffer_start
+            return
+
+        self.counter = self.start_counter + byte_offset // 64
+        self.buffer_offset = len(self.buffer)
+        self._valid_from = len(self.buffer)
+        if byte_offset % 64:
+            self._refill(1)
+            self.buffer_offset += byte_offset % 64
+
+    def generate_range(self, start, length):
+        """
+        Return length bytes of the keystream starting at byte offset start,
+        without moving the current position.
+        """
+        if start < 0:
+            raise ValueError("Offset must be non-negative.")
+        # Only the blocks covering the range
+        skip = start % 64
+        num_blocks = (skip + length + 63) // 64
+        blocks = bytearray(64 * num_blocks)
+        self._blocks_at(self.start_counter + start // 64, memoryview(blocks), num_blocks)
+        return bytes(memoryview(blocks)[skip:skip + length])
+
     def generate_string(self, n):
         """
         Return string of n random bits
@@ -143,6 +440,8 @@ class ChaChaPRNG:
         Return n random bits of BitArray
         n: number of bits to generate
         """
+        from bitstring import BitArray
+
         # Calculate the number of bytes required to produce at least n bits.
         num_bytes = (n + 7) // 8
         rand_bytes = self.generate_bytes(num_bytes)
@@ -151,6 +450,26 @@ class ChaChaPRNG:
         # Return only the first n bits.
         return bits[:n]
     
+    def iter_chunks(self, total_bits, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        """
+        Yield total_bits random bits as packed byte chunks of chunk_bytes
+        bytes (the last one may be shorter). Joined together, the chunks are
+        generate_bits(total_bits).tobytes(): a partial last byte is zero padded.
+        """
+        if chunk_bytes < 1:
+            raise ValueError("chunk_bytes must be at least 1.")
+        remaining = (total_bits + 7) // 8
+        last_byte_mask = (0xff << (-total_bits % 8)) & 0xff
+        buf = bytearray(min(chunk_bytes, remaining))
+
+        while remaining > 0:
+            view = memoryview(buf)[:min(len(buf), remaining)]
+            self.readinto(view)
+            remaining -= len(view)
+            if remaining == 0:
+                view[-1] &= last_byte_mask
+            yield bytes(view)
+
     def get_key(self):
         return key
     
@@ -162,6 +481,8 @@ class ChaChaPRNG:
 
 # Example usage:
 if __name__ == "__main__":
+    import secrets
+
     # Define a secure 32-byte key and a 12-byte nonce.
     key = secrets.token_bytes(32)
     nonce = secrets.token_bytes(12) 
@@ -0,0 +1,211 @@
+import struct
+import random
+import hashlib
+import chacha20
+from chacha20 import ChaChaPRNG, load_numpy
+
+"""
+random.Random backed by the ChaCha20 keystream
+
+ChaChaRandom can be used wherever a random.Random is expected: random,
+getrandbits, randrange, randint, choice, shuffle, sample, uniform,
+gauss, ... all draw from one ChaChaPRNG. Keystream is read into a shared
+buffer BUFFER_BYTES at a time and every call consumes bytes from it, so
+small calls do not generate keystream of their own.
+
+Bytes consumed per value (fixed, so results are reproducible):
+    random(): 8 bytes, the top 53 bits of a little endian uint64
+    getrandbits(k): ceil(k / 8) bytes, the top k bits of a little endian int
+    randrange / randint / choice / shuffle ...: getrandbits(n.bit_length())
+        per candidate, rejection sampled until below n
+    random_floats(n): n x random()
+    randints(n, lo, hi): 8 bytes per candidate, masked to the bit length of
+        the range and rejection sampled
+The bulk methods use NumPy when installed and give the same values
+without it.
+
+Seeding: ChaChaRandom(seed) derives the key from SHA-256 of the seed
+(None: a random key), ChaChaRandom(key=..., nonce=..., counter=...)
+uses that exact ChaCha20 stream. getstate / setstate save and restore the
+stream position. Like random.Random, an instance is not safe to share
+between threads without a lock.
+"""
+
+# Keystream read per refill of the shared buffer (whole ChaCha20 blocks)
+BUFFER_BYTES = 1 << 16
+RECIP_BPF = 2 ** -53
+_UINT64 = struct.Struct('<Q')
+
+
+class ChaChaRandom(random.Random):
+
+    def __init__(self, x=None, key=None, nonce=None, counter=1):
+        """
+        x: seed, as for random.seed (ignored when key is given)
+        key, nonce, counter: explicit ChaCha20 stream (nonce defaults to zeros)
+        """
+        self._buffer = bytearray(BUFFER_BYTES)
+        if key is not None:
+            self._start(key, nonce if nonce is not None else bytes(12), counter)
+            self.gauss_next = None
+        else:
+            super().__init__(x)
+
+    """
+    Use the stream of ChaChaPRNG(key, nonce, counter), with an empty buffer
+    """
+    def _start(self, key, nonce, counter=1):
+        self._prng = ChaChaPRNG(key, nonce, counter)
+        self._pos = len(self._buffer)
+        load_numpy()
+
+    def seed(self, a=None, version=2):
+        """
+        Restart from a new key: SHA-256 of a (int, str, bytes, bytearray),
+        or random when a is None
+        """
+        if a is None:
+            import secrets
+            key = secrets.token_bytes(32)
+        elif isinstance(a, int):
+            key = hashlib.sha256(b"int:" + str(a).encode()).digest()
+        elif isinstance(a, str):
+            key = hashlib.sha256(b"str:" + a.encode()).digest()
+        elif isinstance(a, (bytes, bytearray)):
+            key = hashlib.sha256(b"bytes:" + bytes(a)).digest()
+        else:
+            raise TypeError("The only supported seed types are: None, int, str, bytes, and bytearray.")
+        self._start(key, bytes(12))
+        self.gauss_next = None
+
+    def getstate(self):
+        """
+        Return (key, nonce, start counter, stream position in bytes, gauss_next)
+        """
+        prng = self._prng
+        position = prng.tell() - (len(self._buffer) - self._pos)
+        return (prng.key, prng.nonce, prng.start_counter, position, self.gauss_next)
+
+    def setstate(self, state):
+        key, nonce, counter, position, self.gauss_next = state
+        self._start(key, nonce, counter)
+        self._prng.seek(position)
+
+    """
+    Return the next n bytes of the stream from the shared buffer. Requests
+    larger than the buffer are read straight from the PRNG.
+    """
+    def _take(self, n):
+        pos = self._pos
+        buffer = self._buffer
+        if pos + n <= len(buffer):
+            self._pos = pos + n
+            return buffer[pos:pos + n]
+
+        out = bytearray(n)
+        available = len(buffer) - pos
+        out[:available] = buffer[pos:]
+        rest = n - available
+        if rest >= len(buffer):
+            self._prng.readinto(memoryview(out)[available:])
+            # The buffer was consumed above, nothing in it is left to read
+            self._pos = len(buffer)
+        else:
+            self._prng.readinto(buffer)
+            out[available:] = buffer[:rest]
+            self._pos = rest
+        return out
+
+    """
+    Return the next 8 bytes of the stream as a little endian uint64
+    """
+    def _next_uint64(self):
+        pos = self._pos
+        if pos + 8 > len(self._buffer):
+            return _UINT64.unpack(self._take(8))[0]
+        self._pos = pos + 8
+        return _UINT64.unpack_from(self._buffer, pos)[0]
+
+    def random(self):
+        """
+        Return a float in [0, 1) with 53 random bits
+        """
+        # Same as _next_uint64, inlined: this is the hot path of most methods
+        pos = self._pos
+        if pos + 8 > len(self._buffer):
+            return (_UINT64.unpack(self._take(8))[0] >> 11) * RECIP_BPF
+        self._pos = pos + 8
+        return (_UINT64.unpack_from(self._buffer, pos)[0] >> 11) * RECIP_BPF
+
+    def getrandbits(self, k):
+        """
+        Return an int with k random bits
+        """
+        if k < 0:
+            raise ValueError("number of bits must be non-negative")
+        if k == 0:
+            return 0
+        num_bytes = (k + 7) // 8
+        return int.from_bytes(self._take(num_bytes), 'little') >> (8 * num_bytes - k)
+
+    def randbytes(self, n):
+        """
+        Return the next n bytes of the stream
+        """
+        return bytes(self._take(n))
+
+    def _randbelow(self, n):
+        """
+        Return an int in [0, n) by rejection sampling getrandbits(n.bit_length())
+        (fewer than 2 candidates per value on average)
+        """
+        k = n.bit_length()
+        num_bytes = (k + 7) // 8
+        shift = 8 * num_bytes - k
+        r = int.from_bytes(self._take(num_bytes), 'little') >> shift
+        while r >= n:
+            r = int.from_bytes(self._take(num_bytes), 'little') >> shift
+        return r
+
+    def random_floats(self, n):
+        """
+        Return a list of n floats in [0, 1), the same values as n calls to random()
+        """
+        data = self._take(8 * n)
+        np = chacha20.np
+        if np is not None:
+            return ((np.frombuffer(data, dtype='<u8') >> np.uint64(11)) * RECIP_BPF).tolist()
+        return [(word >> 11) * RECIP_BPF for (word,) in _UINT64.iter_unpack(data)]
+
+    def randints(self, n, lo, hi):
+        """
+        Return a list of n random ints in [lo, hi], both ends included
+        """
+        span = hi - lo + 1
+        if span <= 0:
+            raise ValueError(f"empty range for randints({n}, {lo}, {hi})")
+        if span > 1 << 64:
+            return [lo + self._randbelow(span) for _ in range(n)]
+        mask = (1 << (span - 1).bit_length()) - 1
+
+        np = chacha20.np
+        if np is None:
+            values = []
+            while len(values) < n:
+                value = self._next_uint64() & mask
+                if value < span:
+                    values.append(lo + value)
+            return values
+
+        # Draw exactly as many candidates as values are still missing, so the
+        # stream is consumed as in the loop above
+        result = np.empty(n, dtype=np.uint64)
+        filled = 0
+        while filled < n:
+            candidates = np.frombuffer(self._take(8 * (n - filled)), dtype='<u8') & np.uint64(mask)
+            accepted = candidates[candidates < np.uint64(span)] if span < 1 << 64 else candidates
+            result[filled:filled + len(accepted)] = accepted
+            filled += len(accepted)
+        if -(1 << 63) <= lo and hi < 1 << 63:
+            return (result.astype(np.int64) + np.int64(lo)).tolist()
+        return [lo + value for value in result.tolist()]
@@ -0,0 +1,125 @@
+import time
+
+"""
+Opt-in instrumentation for the PRNGs: counters and cumulative timers
+per stage, plus a cProfile wrapper for single calls.
+
+Disabled by default. A disabled generator only pays one attribute check
+per batch of work (a refill, a readinto call, a generate call), never per
+byte or per squaring:
+
+    prng.enable_stats(callback=None)   # start counting, returns the Stats
+    prng.stats()                       # {"counters": {...}, "timers": {...}}
+    prng.disable_stats()
+
+callback(event, stats) is called after each instrumented operation
+("readinto", "generate", "jump") with the Stats object, for exporting
+to a job runner or metrics system.
+
+ChaChaPRNG counters: blocks, refills, readinto_calls, bytes_out,
+    bytes_direct (blocks written straight into the caller's buffer),
+    bytes_copied (copied from the internal buffer), both counted by
+    readinto only, so bytes_direct + bytes_copied == bytes_out
+    timers: keystream
+BlumBlumShubPRNG counters: squarings, bits_out, generate_calls, jumps
+    timers: generate, jump
+"""
+
+
+class Stats:
+
+    def __init__(self, callback=None):
+        self.counters = {}
+        # name -> [cumulative seconds, number of timed sections]
+        self.timers = {}
+        self.callback = callback
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        timer = self.timers.setdefault(name, [0.0, 0])
+        timer[0] += seconds
+        timer[1] += 1
+
+    def timer(self, name):
+        """
+        Context manager adding the time spent in its body to timer name
+        """
+        stats = self
+
+        class Timer:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                stats.add_time(name, time.perf_counter() - self.start)
+
+        return Timer()
+
+    def emit(self, event):
+        if self.callback is not None:
+            self.callback(event, self)
+
+    def snapshot(self):
+        """
+        Return the counters and timers as a plain dict (JSON serializable)
+        """
+        return {
+            "counters": dict(self.counters),
+            "timers": {name: {"seconds": seconds, "calls": calls}
+                       for name, (seconds, calls) in self.timers.items()},
+        }
+
+    def reset(self):
+        self.counters.clear()
+        self.timers.clear()
+
+
+"""
+Mixin giving a generator the enable_stats / disable_stats / stats methods.
+Instrumented code checks `self._stats is not None` before recording.
+"""
+class Instrumented:
+    _stats = None
+
+    def enable_stats(self, callback=None):
+        """
+        Start recording counters and timers (reset if already enabled).
+        callback(event, stats): called after each instrumented operation.
+        Returns the Stats object.
+        """
+        self._stats = Stats(callback)
+        return self._stats
+
+    def disable_stats(self):
+        self._stats = None
+
+    def stats(self):
+        """
+        Return the recorded counters and timers as a dict
+        (empty when instrumentation is disabled)
+        """
+        if self._stats is None:
+            return {"counters": {}, "timers": {}}
+        return self._stats.snapshot()
+
+
+def profile(func, *args, sort="cumulative", limit=20, path=None, **kwargs):
+    """
+    Run func(*args, **kwargs) under cProfile.
+    sort, limit: ordering and number of lines of the printed report
+    path: also dump the raw profile there (for snakeviz, pstats, ...)
+    Returns (result of func, report text).
+    """
+    import io
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    if path is not None:
+        profiler.dump_stats(path)
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats(sort).print_stats(limit)
+    return result, report.getvalue()
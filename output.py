@@ -0,0 +1,189 @@
+import time
+import hashlib
+
+"""
+Helpers to write PRNG output to disk chunk by chunk, so memory use does
+not grow with the number of bits requested. Chunks come from the
+iter_chunks methods of ChaChaPRNG / BlumBlumShubPRNG: packed bytes, most
+significant bit first, with a partial last byte zero padded.
+
+Info files record the SHA-256 and length of the sample (DigestSink);
+the full integer/hex value (read_uint/write_hex) is only written when
+explicitly requested.
+"""
+
+
+def chunk_to_bitstring(chunk, num_bits):
+    """
+    Return the first num_bits bits of chunk as a '0'/'1' string
+    """
+    if num_bits == 0:
+        return ''
+    return format(int.from_bytes(chunk, 'big'), f'0{8 * len(chunk)}b')[:num_bits]
+
+
+def chunk_to_hex(chunk, num_bits):
+    """
+    Return the hex digits covering the first num_bits bits of chunk
+    """
+    return chunk.hex()[:(num_bits + 3) // 4]
+
+
+"""
+Output sinks: each one receives the chunks in order with write(chunk, num_bits),
+where num_bits is the number of meaningful bits in the chunk, and is closed
+once the stream ends. Sinks can be used as context managers.
+"""
+class Sink:
+    def write(self, chunk, num_bits):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BinarySink(Sink):
+    """
+    Raw packed bytes, same format as BitArray.tobytes()
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+
+    def write(self, chunk, num_bits):
+        self.file.write(chunk)
+
+    def close(self):
+        self.file.close()
+
+
+class HexSink(Sink):
+    """
+    Hex digits (a partial last digit is zero padded)
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w")
+
+    def write(self, chunk, num_bits):
+        self.file.write(chunk_to_hex(chunk, num_bits))
+
+    def close(self):
+        self.file.close()
+
+
+class BitTextSink(Sink):
+    """
+    '0'/'1' bit string, same format as BitArray.bin
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w")
+
+    def write(self, chunk, num_bits):
+        self.file.write(chunk_to_bitstring(chunk, num_bits))
+
+    def close(self):
+        self.file.close()
+
+
+class DigestSink(Sink):
+    """
+    Keeps only the SHA-256 of the packed bytes (the .bin file contents)
+    and the number of bits, nothing is written to disk
+    """
+    def __init__(self, path=None):
+        self.sha256 = hashlib.sha256()
+        self.num_bits = 0
+
+    def write(self, chunk, num_bits):
+        self.sha256.update(chunk)
+        self.num_bits += num_bits
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
+# Sink classes by output format name
+SINKS = {
+    "bin": BinarySink,
+    "hex": HexSink,
+    "text": BitTextSink,
+    "digest": DigestSink,
+}
+
+
+def make_sink(kind, path=None):
+    """
+    Return a new sink of the given format ("bin", "hex", "text" or "digest")
+    """
+    if kind not in SINKS:
+        raise ValueError(f"Unknown output format '{kind}', choose from {', '.join(SINKS)}.")
+    return SINKS[kind](path)
+
+
+def write_stream(chunks, num_bits, sinks):
+    """
+    Pass chunks holding num_bits bits to every sink, then close the sinks.
+    Returns the time in seconds spent generating the chunks, file writes
+    excluded.
+    """
+    remaining = num_bits
+    duration = 0.0
+    chunks = iter(chunks)
+
+    try:
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            duration += time.perf_counter() - start
+            if chunk is None:
+                break
+
+            chunk_bits = min(remaining, 8 * len(chunk))
+            for sink in sinks:
+                sink.write(chunk, chunk_bits)
+            remaining -= chunk_bits
+    finally:
+        for sink in sinks:
+            sink.close()
+    return duration
+
+
+def write_info_digest(f, digest):
+    """
+    Write the streaming digest and length of a sample to the open info file f
+    """
+    f.write(f"PRNG SHA-256: {digest.hexdigest()}\n")
+    f.write(f"PRNG length (bits): {digest.num_bits}\n")
+
+
+def read_uint(bin_path, num_bits):
+    """
+    Return the num_bits bits stored in bin_path as one unsigned integer
+    (same value as BitArray.uint). Needs the whole file in memory and the
+    conversion to decimal is super-linear: only for small samples.
+    """
+    with open(bin_path, "rb") as f:
+        value = int.from_bytes(f.read(), 'big')
+    return value >> (-num_bits % 8)
+
+
+def write_hex(f, bin_path, num_bits, chunk_bytes=1 << 20):
+    """
+    Write the hex digits of the num_bits bits stored in bin_path to the open
+    text file f, reading bin_path chunk by chunk.
+    """
+    remaining = num_bits
+    with open(bin_path, "rb") as bin_f:
+        while remaining > 0:
+            chunk = bin_f.read(chunk_bytes)
+            chunk_bits = min(remaining, 8 * len(chunk))
+            f.write(chunk_to_hex(chunk, chunk_bits))
+            remaining -= chunk_bits
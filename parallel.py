@@ -0,0 +1,166 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from bbs import BlumBlumShubPRNG
+from chacha20 import ChaChaPRNG
+
+"""
+Multi-process generation of large PRNG samples.
+
+ChaCha20 blocks only depend on (key, nonce, counter), so the counter space
+of one stream can be split between processes. Every worker writes its own
+disjoint range of the output file, and the result is byte-identical to a
+single ChaChaPRNG producing the whole stream.
+
+Blum Blum Shub uses jump-ahead (BlumBlumShubPRNG.jump) in the same way:
+each worker starts directly at its first bit position.
+"""
+
+# Bytes each worker generates and writes at a time
+WRITE_CHUNK_BYTES = 1 << 22
+
+# Largest BBS range handed to one worker, bounds the memory of results
+# waiting to be written
+BBS_RANGE_BYTES = 1 << 22
+
+
+"""
+Split num_blocks blocks (or bytes) into at most parts contiguous
+(start, end) ranges
+"""
+def split_blocks(num_blocks, parts):
+    parts = max(1, min(parts, num_blocks))
+    size, extra = divmod(num_blocks, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+"""
+Worker: write blocks [start_block, end_block) of the stream into path.
+The file must already exist with its final size.
+last_byte_mask is applied to the final byte of the file (partial byte).
+"""
+def _chacha_write_range(path, key, nonce, counter, start_block, end_block, total_bytes, last_byte_mask):
+    prng = ChaChaPRNG(key, nonce, counter + start_block)
+    pos = start_block * 64
+    end = min(end_block * 64, total_bytes)
+    buf = bytearray(min(WRITE_CHUNK_BYTES, end - pos))
+
+    with open(path, "r+b") as f:
+        f.seek(pos)
+        while pos < end:
+            view = memoryview(buf)[:min(len(buf), end - pos)]
+            prng.readinto(view)
+            if pos + len(view) == total_bytes:
+                view[-1] &= last_byte_mask
+            f.write(view)
+            pos += len(view)
+    return end_block - start_block
+
+
+def generate_chacha_file(path, key, nonce, num_bits, counter=1, workers=None):
+    """
+    Write num_bits of ChaCha20 output to path using a pool of processes.
+    The file holds the same bytes as ChaChaPRNG(key, nonce, counter)
+    .generate_bits(num_bits).tobytes() (a partial last byte is zero padded).
+    workers: number of processes (default: os.cpu_count())
+    Returns the number of bytes written.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    total_bytes = (num_bits + 7) // 8
+    num_blocks = (total_bytes + 63) // 64
+    last_byte_mask = (0xff << (-num_bits % 8)) & 0xff
+
+    # Preallocate the output so workers can write their ranges in place
+    with open(path, "wb") as f:
+        f.truncate(total_bytes)
+    if total_bytes == 0:
+        return 0
+
+    ranges = split_blocks(num_blocks, workers)
+    args = [(path, key, nonce, counter, start, end, total_bytes, last_byte_mask) for start, end in ranges]
+    if len(ranges) == 1:
+        _chacha_write_range(*args[0])
+    else:
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            # list() so that worker exceptions are raised here
+            list(pool.map(_chacha_write_range, *zip(*args)))
+    return total_bytes
+
+
+"""
+Worker: BBS bytes for bits [start_bit, start_bit + 8 * num_bytes)
+"""
+def _bbs_range_bytes(p, q, seed, bits_per_step, start_bit, num_bytes):
+    prng = BlumBlumShubPRNG(p, q, seed, bits_per_step=bits_per_step, allow_extra_bits=True)
+    # Jump to the step holding start_bit, then drop the bits before it
+    prng.jump(start_bit // bits_per_step)
+    prng.generate_bits(start_bit % bits_per_step)
+    return prng.generate_bits(8 * num_bytes).tobytes()
+
+
+"""
+Run _bbs_range_bytes over byte ranges of the bit range starting at start_bit,
+yielding ((start, end), bytes) for each byte range in order
+"""
+def _bbs_parallel_ranges(p, q, seed, bits_per_step, start_bit, total_bytes, workers):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # Range boundaries fall on multiples of bits_per_step bytes, which is
+    # a whole number of steps
+    units = (total_bytes + bits_per_step - 1) // bits_per_step
+    parts = max(workers, -(-total_bytes // BBS_RANGE_BYTES))
+    ranges = [(bits_per_step * start, min(bits_per_step * end, total_bytes))
+              for start, end in split_blocks(units, parts)]
+    args = [(p, q, seed, bits_per_step, start_bit + 8 * start, end - start) for start, end in ranges]
+    if workers == 1 or len(ranges) == 1:
+        for byte_range, range_args in zip(ranges, args):
+            yield byte_range, _bbs_range_bytes(*range_args)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        yield from zip(ranges, pool.map(_bbs_range_bytes, *zip(*args)))
+
+
+def generate_bbs_bits(p, q, seed, num_bits, start_bit=0, workers=None, bits_per_step=1):
+    """
+    Return num_bits BBS bits starting at bit start_bit, computed by a pool
+    of processes. Identical to BlumBlumShubPRNG(p, q, seed,
+    bits_per_step=bits_per_step).generate_bits on a fresh generator
+    (after skipping start_bit bits).
+    workers: number of processes (default: os.cpu_count())
+    """
+    from bitstring import BitArray
+
+    total_bytes = (num_bits + 7) // 8
+    if total_bytes == 0:
+        return BitArray()
+    chunks = [data for _, data in _bbs_parallel_ranges(p, q, seed, bits_per_step, start_bit, total_bytes, workers)]
+    return BitArray(bytes=b"".join(chunks))[:num_bits]
+
+
+def generate_bbs_file(path, p, q, seed, num_bits, workers=None, bits_per_step=1):
+    """
+    Write num_bits BBS bits to path using a pool of processes.
+    The file holds the same bytes as BlumBlumShubPRNG(p, q, seed,
+    bits_per_step=bits_per_step).generate_bits(num_bits).tobytes()
+    (a partial last byte is zero padded).
+    Returns the number of bytes written.
+    """
+    total_bytes = (num_bits + 7) // 8
+    last_byte_mask = (0xff << (-num_bits % 8)) & 0xff
+
+    with open(path, "wb") as f:
+        f.truncate(total_bytes)
+        if total_bytes == 0:
+            return 0
+        for (start, end), data in _bbs_parallel_ranges(p, q, seed, bits_per_step, 0, total_bytes, workers):
+            if end == total_bytes:
+                data = data[:-1] + bytes([data[-1] & last_byte_mask])
+            f.seek(start)
+            f.write(data)
+    return total_bytes
@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import hashlib
+import subprocess
+from bigint import get_backend
+from primes import find_blum_prime
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+"""
+Persistent on-disk pool of pre-generated Blum primes (prime = 3 mod 4)
+
+Primes are stored by bit size in a JSON file. take_blum_prime pops one
+instantly (generating it on the spot if the pool is empty) and starts a
+detached background process to refill the pool once it runs low.
+A SHA-256 of every prime handed out is kept, so the same prime is never
+handed out twice, even if a later search finds it again.
+
+Location: PRIME_POOL_DIR environment variable, default prime_pool/ next
+to this file. The pool holds secret material, files are created 0600.
+"""
+
+ENV_VAR = "PRIME_POOL_DIR"
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prime_pool")
+# Number of primes per bit size the background refill aims for
+DEFAULT_TARGET = 8
+
+
+def _fingerprint(prime):
+    return hashlib.sha256(str(prime).encode()).hexdigest()
+
+
+class PrimePool:
+
+    def __init__(self, directory=None, backend=None):
+        if directory is None:
+            directory = os.environ.get(ENV_VAR, DEFAULT_DIR)
+        self.directory = directory
+        self.path = os.path.join(directory, "pool.json")
+        self.lock_path = os.path.join(directory, "pool.lock")
+        self.backend = backend
+        os.makedirs(directory, exist_ok=True)
+        # Background refill processes by bit size
+        self._refills = {}
+
+    """
+    Context manager holding an exclusive lock on the pool file
+    (no locking on platforms without fcntl)
+    """
+    def _locked(self):
+        pool = self
+
+        class Lock:
+            def __enter__(self):
+                self.fd = os.open(pool.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+                if fcntl is not None:
+                    fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+            def __exit__(self, *exc):
+                if fcntl is not None:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+                os.close(self.fd)
+
+        return Lock()
+
+    """
+    Read the pool contents (call with the lock held)
+    """
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        data.setdefault("primes", {})
+        data.setdefault("used", [])
+        return data
+
+    """
+    Write the pool contents atomically (call with the lock held)
+    """
+    def _save(self, data):
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def size(self, bits):
+        """
+        Number of primes of 'bits' bits currently in the pool
+        """
+        with self._locked():
+            return len(self._load()["primes"].get(str(bits), []))
+
+    def add(self, bits, primes):
+        """
+        Add primes of 'bits' bits to the pool, skipping any already in the
+        pool or already handed out. Returns the number of primes added.
+        """
+        with self._locked():
+            data = self._load()
+            stored = data["primes"].setdefault(str(bits), [])
+            seen = set(data["used"]) | {_fingerprint(int(p, 16)) for p in stored}
+            added = 0
+            for prime in primes:
+                if _fingerprint(prime) not in seen:
+                    stored.append(hex(prime))
+                    seen.add(_fingerprint(prime))
+                    added += 1
+            self._save(data)
+        return added
+
+    def fill(self, bits, target=DEFAULT_TARGET):
+        """
+        Generate primes of 'bits' bits until the pool holds target of them.
+        Primes are committed one at a time, so an interrupted fill keeps
+        its progress.
+        """
+        while self.size(bits) < target:
+            self.add(bits, [find_blum_prime(bits, self.backend)])
+
+    def start_refill(self, bits, target=DEFAULT_TARGET):
+        """
+        Run fill(bits, target) in a detached background process (this file's
+        command line), unless one is already running for this bit size.
+        The process is in its own session, so it finishes the refill even
+        after this program exits. Returns the subprocess.Popen.
+        """
+        process = self._refills.get(bits)
+        if process is not None and process.poll() is None:
+            return process
+        command = [sys.executable, os.path.abspath(__file__), "--bits", str(bits),
+                   "--count", str(target), "--dir", self.directory]
+        if self.backend is not None:
+            command += ["--backend", self.backend]
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                   start_new_session=True)
+        self._refills[bits] = process
+        return process
+
+    """
+    Pop the first valid prime of 'bits' bits from the pool and mark it used
+    (call with the lock held). Invalid entries are dropped on the way.
+    Returns (prime or None, primes left).
+    """
+    def _pop_valid(self, data, bits):
+        is_prime = get_backend(self.backend).is_prime
+        stored = data["primes"].get(str(bits), [])
+        used = set(data["used"])
+        prime = None
+        while stored:
+            candidate = int(stored.pop(), 16)
+            if (_fingerprint(candidate) not in used and candidate % 4 == 3
+                    and candidate.bit_length() == bits and is_prime(candidate)):
+                prime = candidate
+                data["used"].append(_fingerprint(prime))
+                break
+        return prime, len(stored)
+
+    def take(self, bits, refill_to=DEFAULT_TARGET):
+        """
+        Pop a verified Blum prime of 'bits' bits. If the pool is empty one is
+        generated on the spot, without holding the pool lock. Once fewer than
+        refill_to / 2 primes are left a background refill up to refill_to is
+        started (refill_to=0: never).
+        """
+        with self._locked():
+            data = self._load()
+            prime, remaining = self._pop_valid(data, bits)
+            self._save(data)
+
+        # Generated on the spot: other processes can use the pool meanwhile,
+        # and the prime is only committed if it was never handed out
+        while prime is None:
+            candidate = find_blum_prime(bits, self.backend)
+            with self._locked():
+                data = self._load()
+                if _fingerprint(candidate) not in data["used"]:
+                    prime = candidate
+                    data["used"].append(_fingerprint(prime))
+                    self._save(data)
+                remaining = len(data["primes"].get(str(bits), []))
+
+        if refill_to and remaining < refill_to // 2:
+            self.start_refill(bits, refill_to)
+        return prime
+
+
+# Pool used by take_blum_prime, created on first use
+_default_pool = None
+
+
+def take_blum_prime(bits, refill_to=DEFAULT_TARGET):
+    """
+    Pop a Blum prime of 'bits' bits from the default on-disk pool
+    (see PrimePool.take). Never returns the same prime twice.
+    """
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = PrimePool()
+    return _default_pool.take(bits, refill_to)
+
+
+# Fill the pool ahead of a sweep:
+#   python prime_pool.py --bits 512 1024 --count 16
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fill the on-disk Blum prime pool")
+    parser.add_argument("--bits", type=int, nargs="+", required=True, help="Prime sizes to fill")
+    parser.add_argument("--count", type=int, default=DEFAULT_TARGET, help="Primes to keep per size")
+    parser.add_argument("--dir", type=str, default=None, help="Pool directory (default: PRIME_POOL_DIR or prime_pool/)")
+    parser.add_argument("--backend", type=str, default=None, help="Big integer backend (auto, gmpy2, python)")
+    args = parser.parse_args()
+
+    pool = PrimePool(args.dir, args.backend)
+    for bits in args.bits:
+        pool.fill(bits, args.count)
+        print(f"{bits}-bit: {pool.size(bits)} primes in {pool.path}")
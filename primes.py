@@ -1,17 +1,42 @@
 import secrets
-from sympy import nextprime
+from bigint import get_backend
 
-def generate_blum_prime(bits):
+# Candidates per sieve window in find_blum_prime
+SIEVE_WINDOW = 4096
+# Candidates are sieved by every odd prime below this bound
+SIEVE_BOUND = 2048
+
+
+def small_primes(bound):
+    """
+    Return the odd primes below bound (sieve of Eratosthenes)
+    """
+    is_prime = bytearray([1]) * bound
+    is_prime[:2] = b"\x00\x00"
+    for i in range(2, int(bound ** 0.5) + 1):
+        if is_prime[i]:
+            is_prime[i * i::i] = bytes(len(range(i * i, bound, i)))
+    return [i for i in range(3, bound) if is_prime[i]]
+
+
+SMALL_PRIMES = small_primes(SIEVE_BOUND)
+# 4^-1 mod s for every small prime s, to solve candidate + 4k = 0 mod s
+INV4 = [pow(4, s - 2, s) for s in SMALL_PRIMES]
+
+def generate_blum_prime(bits, backend=None):
     """
     Generate BBS prime
 
     Parameters:
         bits (int): The bit length of the desired prime
+        backend (str): Big integer backend for primality tests
+            ("auto", "gmpy2" or "python", see bigint.py)
     
     Returns:
         int: A prime number of 'bits' bits such that prime % 4 == 3
     """
     assert bits >= 2, "Bit size must be at least 2."
+    nextprime = get_backend(backend).next_prime
     
     while True:
         # Generate a candidate with the desired bit length.
@@ -36,4 +61,82 @@ def generate_blum_prime(bits):
                 if candidate % 4 == 3:
                     return candidate
             # If we exceeded the bit length, start over.
-            continue
\ No newline at end of file
+            continue
+
+
+def find_blum_prime(bits, backend=None, window=SIEVE_WINDOW):
+    """
+    Generate BBS prime with a sieve, faster than generate_blum_prime
+
+    Only candidates = 3 mod 4 are considered: base, base + 4, base + 8, ...
+    for a random base. Each window of candidates is sieved by the small
+    primes, and the primality test (see bigint.py) only runs on the
+    survivors. Residues of the window start are updated incrementally when
+    moving to the next window.
+
+    Parameters:
+        bits (int): The bit length of the desired prime
+        backend (str): Big integer backend for primality tests
+            ("auto", "gmpy2" or "python", see bigint.py)
+        window (int): Number of candidates sieved at once
+
+    Returns:
+        int: A prime number of 'bits' bits such that prime % 4 == 3
+    """
+    assert bits >= 2, "Bit size must be at least 2."
+    is_prime = get_backend(backend).is_prime
+
+    while True:
+        # Random candidate with exactly 'bits' bits and = 3 mod 4
+        base = secrets.randbits(bits) | (1 << (bits - 1)) | 3
+        residues = [base % s for s in SMALL_PRIMES]
+
+        while base.bit_length() == bits:
+            # sieve[k] == 1 while base + 4k may be prime
+            sieve = bytearray([1]) * window
+            for s, inv4, r in zip(SMALL_PRIMES, INV4, residues):
+                if s >= base:
+                    break
+                k = (-r * inv4) % s
+                sieve[k::s] = bytes(len(range(k, window, s)))
+
+            k = sieve.find(1)
+            while k != -1:
+                candidate = base + 4 * k
+                if candidate.bit_length() > bits:
+                    break
+                if is_prime(candidate):
+                    return candidate
+                k = sieve.find(1, k + 1)
+
+            # Move on to the next window
+            step = 4 * window
+            base += step
+            residues = [(r + step) % s for s, r in zip(SMALL_PRIMES, residues)]
+        # If we exceeded the bit length, start over.
+
+
+def find_blum_prime_pair(bits, backend=None, workers=2):
+    """
+    Generate distinct BBS primes p and q of 'bits' bits with find_blum_prime,
+    searching for both at the same time in separate processes.
+
+    Parameters:
+        bits (int): The bit length of the desired primes
+        backend (str): Big integer backend for primality tests
+        workers (int): Number of processes, 1 searches in this process
+
+    Returns:
+        (int, int): p, q
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    while True:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, 2)) as pool:
+                p, q = pool.map(find_blum_prime, [bits, bits], [backend, backend])
+        else:
+            p = find_blum_prime(bits, backend)
+            q = find_blum_prime(bits, backend)
+        if p != q:
+            return p, q
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+import os
+import json
+import socket
+import struct
+import asyncio
+import tempfile
+import threading
+import collections
+from instrumentation import Stats
+
+"""
+Local randomness service over a Unix domain socket
+
+One server process owns the generators (a ChaChaPRNG, optionally a
+BlumBlumShubPRNG) and serves their bytes to any number of local clients,
+so client processes do not seed and warm up generators of their own.
+
+Protocol (all integers big endian):
+    request:  generator id (1 byte) + number of bytes (4 bytes)
+    response: status (1 byte) + payload length (4 bytes) + payload
+              status 0: payload is the random bytes
+              status 1: payload is a UTF-8 error message
+Generator ids: 0 ChaCha20, 1 BBS, 255 server stats (JSON payload).
+Requests may be pipelined; responses come back in request order.
+
+Requests that arrive while a generation is running are batched: each
+generator serves all its waiting requests with one large generation,
+split between the requests in arrival order. Small ChaCha20 batches are
+generated on the event loop, large ones and BBS batches in a thread so the
+loop keeps accepting requests.
+
+    python random_service.py [--socket PATH] [--bbs PRIME_BITS] [--max-batch N]
+
+Clients: RandomClient (one blocking connection), ClientPool (thread-safe
+pool of blocking connections) and AsyncClientPool (asyncio).
+"""
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "prng_service.sock")
+REQUEST = struct.Struct(">BI")
+RESPONSE = struct.Struct(">BI")
+GENERATORS = {"chacha": 0, "bbs": 1}
+STATS_ID = 255
+STATUS_OK = 0
+STATUS_ERROR = 1
+# Largest single request
+MAX_REQUEST_BYTES = 1 << 24
+# Most requests / bytes served by one generation
+DEFAULT_MAX_BATCH = 1024
+MAX_BATCH_BYTES = 1 << 22
+# ChaCha20 batches up to this size are generated on the event loop
+INLINE_BYTES = 1 << 16
+
+
+"""
+Generate n bytes with prng into a new buffer (runs on the loop or in a thread)
+"""
+def _generate(prng, n):
+    if hasattr(prng, "readinto"):
+        data = bytearray(n)
+        prng.readinto(data)
+        return data
+    return prng.generate_bytes(n)
+
+
+class RandomServer:
+
+    def __init__(self, path=DEFAULT_SOCKET, generators=None, max_batch=DEFAULT_MAX_BATCH):
+        """
+        path: Unix socket path (a stale socket file there is replaced)
+        generators: {"chacha": prng, "bbs": prng}, default a fresh ChaChaPRNG
+        max_batch: most requests served by one generation (1: no batching)
+        """
+        if generators is None:
+            import secrets
+            from chacha20 import ChaChaPRNG
+            generators = {"chacha": ChaChaPRNG(secrets.token_bytes(32), secrets.token_bytes(12))}
+        unknown = set(generators) - set(GENERATORS)
+        if unknown:
+            raise ValueError(f"Unknown generators: {', '.join(sorted(unknown))} (choose from {', '.join(GENERATORS)}).")
+        self.path = path
+        self.generators = generators
+        self.max_batch = max_batch
+        self._queues = {}
+        self._batchers = []
+        # Connection handler tasks, cancelled by close
+        self._handlers = set()
+        self._server = None
+        self._stats = Stats()
+
+    async def start(self):
+        """
+        Start the batchers and listen on the socket (owner-only permissions)
+        """
+        for name, prng in self.generators.items():
+            queue = asyncio.Queue()
+            self._queues[GENERATORS[name]] = queue
+            self._batchers.append(asyncio.create_task(self._batcher(name, prng, queue)))
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, self.path)
+        os.chmod(self.path, 0o600)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stop listening, end the open connections (requests already read
+        are still answered), then stop the batchers and remove the socket
+        """
+        if self._server is not None:
+            self._server.close()
+        for task in self._handlers:
+            task.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        for task in self._batchers:
+            task.cancel()
+        await asyncio.gather(*self._batchers, return_exceptions=True)
+        self._batchers.clear()
+        if self._server is not None:
+            await self._server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def stats(self):
+        """
+        Return the counters and timers, plus the mean batch size
+        """
+        snapshot = self._stats.snapshot()
+        counters = snapshot["counters"]
+        if counters.get("batches"):
+            snapshot["requests_per_batch"] = counters["requests"] / counters["batches"]
+        snapshot["generators"] = list(self.generators)
+        return snapshot
+
+    """
+    Serve the requests queued for one generator, every request waiting at
+    the time of a generation in the same batch
+    """
+    async def _batcher(self, name, prng, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            total = batch[0][0]
+            while len(batch) < self.max_batch and not queue.empty() and total < MAX_BATCH_BYTES:
+                request = queue.get_nowait()
+                batch.append(request)
+                total += request[0]
+
+            with self._stats.timer(f"generate_{name}"):
+                try:
+                    if name == "chacha" and total <= INLINE_BYTES:
+                        data = _generate(prng, total)
+                    else:
+                        data = await loop.run_in_executor(None, _generate, prng, total)
+                except Exception as e:
+                    for n, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+            # Responses are slices of the batch buffer, no copies
+            view = memoryview(data)
+            pos = 0
+            for n, future in batch:
+                if not future.done():
+                    future.set_result(view[pos:pos + n])
+                pos += n
+            self._stats.count("batches")
+            self._stats.count("requests", len(batch))
+            self._stats.count("bytes_out", total)
+
+    """
+    Connection handler: read requests and queue them, responses are sent
+    in order by _send
+    """
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        pending = asyncio.Queue()
+        sender = asyncio.create_task(self._send(writer, pending))
+        try:
+            while True:
+                generator_id, n = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                future = loop.create_future()
+                if generator_id == STATS_ID:
+                    future.set_result(json.dumps(self.stats()).encode())
+                elif generator_id not in self._queues:
+                    future.set_exception(ValueError(f"Generator {generator_id} is not served."))
+                elif n > MAX_REQUEST_BYTES:
+                    future.set_exception(ValueError(f"Requests are limited to {MAX_REQUEST_BYTES} bytes."))
+                else:
+                    self._queues[generator_id].put_nowait((n, future))
+                pending.put_nowait(future)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # CancelledError: closed by the server
+            pass
+        finally:
+            pending.put_nowait(None)
+            await sender
+            writer.close()
+            self._handlers.discard(task)
+
+    """
+    Write the response of every queued future, in request order
+    """
+    async def _send(self, writer, pending):
+        broken = False
+        while True:
+            future = await pending.get()
+            if future is None:
+                return
+            try:
+                payload = await future
+                status = STATUS_OK
+            except Exception as e:
+                payload = str(e).encode()
+                status = STATUS_ERROR
+                self._stats.count("errors")
+            if broken:
+                continue
+            try:
+                writer.write(RESPONSE.pack(status, len(payload)))
+                writer.write(payload)
+                # Flush once no other response is ready
+                if pending.empty():
+                    await writer.drain()
+            except ConnectionError:
+                broken = True
+
+
+"""
+Read exactly n bytes from a blocking socket
+"""
+def _recv_exactly(sock, n):
+    data = bytearray(n)
+    view = memoryview(data)
+    pos = 0
+    while pos < n:
+        received = sock.recv_into(view[pos:])
+        if received == 0:
+            raise ConnectionError("Randomness server closed the connection.")
+        pos += received
+    return data
+
+
+"""
+Turn a response into its payload, raising on an error status
+"""
+def _payload(status, payload):
+    if status != STATUS_OK:
+        raise RuntimeError(f"Randomness server error: {bytes(payload).decode()}")
+    return bytes(payload)
+
+
+class RandomClient:
+    """
+    One blocking connection to the randomness server (not thread-safe,
+    see ClientPool)
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+
+    """
+    Send one request and read its whole response, returns (status, payload)
+    """
+    def _exchange(self, generator_id, n):
+        self.sock.sendall(REQUEST.pack(generator_id, n))
+        status, length = RESPONSE.unpack(_recv_exactly(self.sock, RESPONSE.size))
+        return status, _recv_exactly(self.sock, length)
+
+    def _request(self, generator_id, n):
+        return _payload(*self._exchange(generator_id, n))
+
+    def get_bytes(self, n, generator="chacha"):
+        """
+        Return n random bytes from the server's generator ("chacha" or "bbs")
+        """
+        return self._request(GENERATORS[generator], n)
+
+    def stats(self):
+        return json.loads(self._request(STATS_ID, 0))
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ClientPool:
+    """
+    Thread-safe pool of at most size connections, opened on first use.
+    A connection whose request fails or is interrupted is closed and
+    replaced on the next request; an error response from the server
+    completes the exchange, so its connection is kept.
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET, size=4, timeout=None):
+        self.path = path
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get_bytes(self, n, generator="chacha"):
+        """
+        Return n random bytes from the server's generator ("chacha" or "bbs")
+        """
+        generator_id = GENERATORS[generator]
+        self._slots.acquire()
+        try:
+            with self._lock:
+                client = self._idle.pop() if self._idle else None
+            if client is None:
+                client = RandomClient(self.path, self.timeout)
+            try:
+                status, payload = client._exchange(generator_id, n)
+            except BaseException:
+                # The response may be half read: never reuse the connection
+                client.close()
+                raise
+            with self._lock:
+                self._idle.append(client)
+            return _payload(status, payload)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            for client in self._idle:
+                client.close()
+            self._idle.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncClientPool:
+    """
+    Pool of asyncio connections for coroutines. Each connection serves one
+    request at a time; open with `await AsyncClientPool.open(path, size)`.
+    A connection whose request fails or is cancelled (asyncio.wait_for
+    timeouts included) is closed and replaced on the next request.
+    """
+
+    def __init__(self, connections, path=DEFAULT_SOCKET):
+        self.path = path
+        self._connections = connections
+        self._idle = list(connections)
+        # Futures of coroutines waiting for a connection, served first come first served
+        self._waiters = collections.deque()
+
+    @classmethod
+    async def open(cls, path=DEFAULT_SOCKET, size=4):
+        connections = [await asyncio.open_unix_connection(path) for _ in range(size)]
+        return cls(connections, path)
+
+    async def _acquire(self):
+        if self._idle and not self._waiters:
+            return self._idle.pop()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            # Cancelled after being handed a connection: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self._release(waiter.result())
+            raise
+
+    """
+    Hand the connection (None: a free slot to open one in) to the longest
+    waiting coroutine, if any
+    """
+    def _release(self, connection):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(connection)
+                return
+        self._idle.append(connection)
+
+    async def _request(self, generator_id, n):
+        connection = await self._acquire()
+        try:
+            if connection is None:
+                connection = await asyncio.open_unix_connection(self.path)
+                self._connections.append(connection)
+            reader, writer = connection
+            writer.write(REQUEST.pack(generator_id, n))
+            await writer.drain()
+            status, length = RESPONSE.unpack(await reader.readexactly(RESPONSE.size))
+            payload = await reader.readexactly(length)
+        except BaseException:
+            # The request may still be in flight or its response half read:
+            # never reuse the connection, free its slot instead
+            if connection is not None:
+                self._connections.remove(connection)
+                connection[1].close()
+            self._release(None)
+            raise
+        # Only reused after a complete exchange
+        self._release(connection)
+        return _payload(status, payload)
+
+    async def get_bytes(self, n, generator="chacha"):
+        """
+        Return n random bytes from the server's generator ("chacha" or "bbs")
+        """
+        return await self._request(GENERATORS[generator], n)
+
+    async def stats(self):
+        return json.loads(await self._request(STATS_ID, 0))
+
+    async def close(self):
+        for reader, writer in self._connections:
+            writer.close()
+        for reader, writer in self._connections:
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+"""
+Build the generators served by the command line server
+"""
+def _make_generators(bbs_prime_bits):
+    import math
+    import secrets
+    from chacha20 import ChaChaPRNG
+
+    generators = {"chacha": ChaChaPRNG(secrets.token_bytes(32), secrets.token_bytes(12))}
+    if bbs_prime_bits:
+        from bbs import BlumBlumShubPRNG
+        from prime_pool import take_blum_prime
+
+        p = take_blum_prime(bbs_prime_bits)
+        q = take_blum_prime(bbs_prime_bits)
+        n = p * q
+        seed = secrets.randbelow(n - 2) + 2
+        while math.gcd(seed, n) != 1:
+            seed = secrets.randbelow(n - 2) + 2
+        generators["bbs"] = BlumBlumShubPRNG(p, q, seed)
+    return generators
+
+
+if __name__ == "__main__":
+    import signal
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve PRNG output over a Unix domain socket")
+    parser.add_argument("--socket", type=str, default=DEFAULT_SOCKET, help=f"Socket path (default: {DEFAULT_SOCKET})")
+    parser.add_argument("--bbs", type=int, default=None, metavar="PRIME_BITS", help="Also serve BBS with primes of this size")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Most requests per generation (1: no batching)")
+    args = parser.parse_args()
+
+    server = RandomServer(args.socket, _make_generators(args.bbs), args.max_batch)
+
+    async def run():
+        # Shut down cleanly (removing the socket file) on SIGTERM as on Ctrl-C
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        await server.start()
+        print(f"Serving {', '.join(server.generators)} on {args.socket}", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
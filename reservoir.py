@@ -0,0 +1,251 @@
+import time
+import threading
+from instrumentation import Stats
+
+"""
+Prefetching keystream reservoir for small, latency-sensitive requests
+
+A background producer thread keeps up to `capacity` bytes of a
+ChaChaPRNG's stream generated ahead of time in a ring buffer. Requests are
+served by copying out of the ring, so a 16-64 byte request never runs a
+keystream refill on the caller's thread.
+
+Watermarks: when the reservoir level falls to low_watermark the producer
+wakes up and refills it up to high_watermark (default: capacity), in
+steps of chunk_bytes. The producer writes directly into the free part of
+the ring without holding the lock; the lock is only held to move the ring
+positions and to copy a request out.
+
+The bytes served are the PRNG's stream in order: reading n bytes from
+the reservoir gives the same bytes as prng.generate_bytes(n) would have.
+Concurrent readers are served one request at a time, so every request
+is a contiguous piece of the stream. The PRNG must not be used directly
+while the reservoir owns it.
+
+Counters (stats()): hits (requests served without waiting), misses
+(requests that had to wait for the producer), bytes_out, refills
+(producer steps), bytes_produced, plus the wait timer and current level.
+"""
+
+DEFAULT_CAPACITY = 1 << 20
+DEFAULT_CHUNK_BYTES = 1 << 16
+
+
+class KeystreamReservoir:
+
+    def __init__(self, prng, capacity=DEFAULT_CAPACITY, low_watermark=None, high_watermark=None,
+                 chunk_bytes=DEFAULT_CHUNK_BYTES, prefill=True):
+        """
+        prng: generator with a readinto method (ChaChaPRNG)
+        capacity: size of the ring buffer in bytes
+        low_watermark: level at which the producer starts refilling (default: capacity // 2)
+        high_watermark: level at which it stops (default: capacity)
+        chunk_bytes: bytes generated per producer step
+        prefill: wait until the reservoir first reaches high_watermark
+        """
+        if high_watermark is None:
+            high_watermark = capacity
+        if low_watermark is None:
+            low_watermark = high_watermark // 2
+        if not 0 <= low_watermark < high_watermark <= capacity:
+            raise ValueError("Watermarks must satisfy 0 <= low < high <= capacity.")
+        if chunk_bytes < 1:
+            raise ValueError("chunk_bytes must be at least 1.")
+        self.prng = prng
+        self.capacity = capacity
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.chunk_bytes = chunk_bytes
+
+        self._ring = memoryview(bytearray(capacity))
+        # Total bytes read from / written to the ring since the start
+        self._read_pos = 0
+        self._write_pos = 0
+        self._cond = threading.Condition()
+        # Held for a whole request, so a request waiting for the producer keeps its place
+        self._read_lock = threading.Lock()
+        self._closed = False
+        self._error = None
+        self._stats = Stats()
+
+        self._producer = threading.Thread(target=self._produce, name="keystream-reservoir", daemon=True)
+        self._producer.start()
+        if prefill:
+            self.wait_level(high_watermark)
+
+    """
+    Producer thread: sleep until the level drops to the low watermark, then
+    fill up to the high watermark
+    """
+    def _produce(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self._closed and self._write_pos - self._read_pos > self.low_watermark:
+                        self._cond.wait()
+                    if self._closed:
+                        return
+
+                while True:
+                    with self._cond:
+                        if self._closed:
+                            return
+                        level = self._write_pos - self._read_pos
+                        start = self._write_pos % self.capacity
+                    # The region after the write position is free: only the
+                    # producer writes there, so no lock is needed
+                    length = min(self.chunk_bytes, self.high_watermark - level, self.capacity - start)
+                    if length <= 0:
+                        break
+                    self.prng.readinto(self._ring[start:start + length])
+                    with self._cond:
+                        self._write_pos += length
+                        self._stats.count("refills")
+                        self._stats.count("bytes_produced", length)
+                        self._cond.notify_all()
+        except BaseException as e:
+            with self._cond:
+                self._error = e
+                self._cond.notify_all()
+
+    """
+    Raise if the reservoir can no longer produce (call with the lock held)
+    """
+    def _check(self):
+        if self._error is not None:
+            raise RuntimeError("Keystream producer failed.") from self._error
+        if self._closed:
+            raise ValueError("Reservoir is closed.")
+
+    def readinto(self, buffer):
+        """
+        Fill a writable buffer with the next bytes of the stream, waiting
+        for the producer when the reservoir runs dry.
+        Returns the number of bytes written.
+        """
+        view = memoryview(buffer).cast('B')
+        n = len(view)
+        pos = 0
+        waited = False
+
+        with self._read_lock, self._cond:
+            if self._closed:
+                raise ValueError("Reservoir is closed.")
+            while pos < n:
+                level = self._write_pos - self._read_pos
+                if level == 0:
+                    self._check()
+                    if not waited:
+                        waited = True
+                        wait_start = time.perf_counter()
+                    self._cond.notify_all()
+                    self._cond.wait()
+                    continue
+                # Copy the contiguous part of the ring, wrapping at most once per pass
+                start = self._read_pos % self.capacity
+                take = min(n - pos, level, self.capacity - start)
+                view[pos:pos + take] = self._ring[start:start + take]
+                self._read_pos += take
+                pos += take
+
+            if self._write_pos - self._read_pos <= self.low_watermark:
+                self._cond.notify_all()
+            if waited:
+                self._stats.count("misses")
+                self._stats.add_time("wait", time.perf_counter() - wait_start)
+            else:
+                self._stats.count("hits")
+            self._stats.count("bytes_out", n)
+        return n
+
+    def generate_bytes(self, n):
+        """
+        Return the next n bytes of the stream
+        """
+        result = bytearray(n)
+        self.readinto(result)
+        return bytes(result)
+
+    def level(self):
+        """
+        Number of bytes currently ready in the reservoir
+        """
+        with self._cond:
+            return self._write_pos - self._read_pos
+
+    def wait_level(self, level, timeout=None):
+        """
+        Block until at least level bytes are ready (at most capacity).
+        Returns False on timeout.
+        """
+        level = min(level, self.high_watermark)
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._error is not None or self._closed or self._write_pos - self._read_pos >= level,
+                timeout)
+            if ready:
+                self._check()
+            return ready
+
+    def stats(self):
+        """
+        Return the counters, the wait timer and the current level as a dict
+        """
+        with self._cond:
+            snapshot = self._stats.snapshot()
+            snapshot["level"] = self._write_pos - self._read_pos
+        snapshot["capacity"] = self.capacity
+        snapshot["low_watermark"] = self.low_watermark
+        snapshot["high_watermark"] = self.high_watermark
+        return snapshot
+
+    def close(self):
+        """
+        Stop the producer thread. Bytes left in the reservoir are discarded.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._producer.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Compare the latency of small requests with and without the reservoir:
+#   python reservoir.py [--requests 100000] [--size 32]
+if __name__ == "__main__":
+    import secrets
+    import argparse
+    from chacha20 import ChaChaPRNG
+
+    parser = argparse.ArgumentParser(description="Latency of small keystream requests with and without a reservoir")
+    parser.add_argument("--requests", type=int, default=100_000, help="Number of requests")
+    parser.add_argument("--size", type=int, default=32, help="Bytes per request")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="Reservoir capacity in bytes")
+    args = parser.parse_args()
+
+    def measure(read):
+        times = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            read(args.size)
+            times.append(time.perf_counter() - start)
+        times.sort()
+        result = {f"p{p}": times[min(len(times) - 1, int(p / 100 * len(times)))] * 1e6 for p in (50, 99, 99.9)}
+        result["max"] = times[-1] * 1e6
+        return result
+
+    key, nonce = secrets.token_bytes(32), secrets.token_bytes(12)
+    direct = measure(ChaChaPRNG(key, nonce).generate_bytes)
+    with KeystreamReservoir(ChaChaPRNG(key, nonce), args.capacity) as reservoir:
+        pooled = measure(reservoir.generate_bytes)
+        stats = reservoir.stats()
+
+    for label, result in (("direct", direct), ("reservoir", pooled)):
+        print(f"{label:>10}: " + ", ".join(f"{name} {us:.1f} us" for name, us in result.items()))
+    counters = stats["counters"]
+    print(f"reservoir hits {counters.get('hits', 0)}, misses {counters.get('misses', 0)}, refills {counters.get('refills', 0)}")
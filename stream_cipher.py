@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import os
+import mmap
+import chacha20
+from chacha20 import ChaChaPRNG
+
+"""
+ChaCha20 stream encryption: data XOR keystream of ChaChaPRNG(key, nonce,
+counter). Encryption and decryption are the same operation.
+
+Files are processed in windows of chunk_bytes: each window of the input
+and output is memory-mapped, XORed with a keystream chunk generated in
+place by readinto (with NumPy when available), then unmapped. Memory use
+does not depend on the file size.
+
+counter: block counter of the first 64 bytes (default 1, as in
+    ChaChaPRNG). Encrypting with counter c and decrypting with counter c
+    gives the original data back.
+"""
+
+# Multiple of mmap.ALLOCATIONGRANULARITY, so windows can be mapped at any chunk offset
+DEFAULT_CHUNK_BYTES = 1 << 22
+
+
+def _xor_into(dst, src, keystream):
+    """
+    dst[:] = src XOR keystream, all three buffers of the same length
+    """
+    np = chacha20.load_numpy()
+    if np is not None:
+        np.bitwise_xor(np.frombuffer(src, dtype=np.uint8), np.frombuffer(keystream, dtype=np.uint8),
+                       out=np.frombuffer(dst, dtype=np.uint8))
+    else:
+        n = len(dst)
+        dst[:] = (int.from_bytes(src, 'little') ^ int.from_bytes(keystream, 'little')).to_bytes(n, 'little')
+
+
+def xor_stream(data, key, nonce, counter=1, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Return data (any bytes-like object) XOR the keystream, as bytes
+    """
+    prng = ChaChaPRNG(key, nonce, counter)
+    src = memoryview(data).cast('B')
+    out = bytearray(len(src))
+    dst = memoryview(out)
+    keystream = memoryview(bytearray(min(chunk_bytes, len(src))))
+
+    for start in range(0, len(src), chunk_bytes):
+        end = min(start + chunk_bytes, len(src))
+        ks = keystream[:end - start]
+        prng.readinto(ks)
+        _xor_into(dst[start:end], src[start:end], ks)
+    return bytes(out)
+
+
+def encrypt_file(input_path, output_path, key, nonce, counter=1, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Write input_path XOR the keystream to output_path (which may be the
+    same file, for in-place encryption).
+    Returns the number of bytes processed.
+    """
+    if chunk_bytes % mmap.ALLOCATIONGRANULARITY:
+        raise ValueError(f"chunk_bytes must be a multiple of {mmap.ALLOCATIONGRANULARITY}.")
+    prng = ChaChaPRNG(key, nonce, counter)
+    size = os.path.getsize(input_path)
+    in_place = os.path.exists(output_path) and os.path.samefile(input_path, output_path)
+
+    with open(input_path, "r+b" if in_place else "rb") as fin:
+        fout = fin if in_place else open(output_path, "w+b")
+        try:
+            fout.truncate(size)
+            # Empty files cannot be mapped, and need no keystream
+            if size == 0:
+                return 0
+            keystream = memoryview(bytearray(min(chunk_bytes, size)))
+
+            for start in range(0, size, chunk_bytes):
+                length = min(chunk_bytes, size - start)
+                ks = keystream[:length]
+                prng.readinto(ks)
+                out_map = mmap.mmap(fout.fileno(), length, access=mmap.ACCESS_WRITE, offset=start)
+                in_map = out_map if in_place else mmap.mmap(fin.fileno(), length, access=mmap.ACCESS_READ, offset=start)
+                try:
+                    with memoryview(out_map) as dst, memoryview(in_map) as src:
+                        _xor_into(dst, src, ks)
+                finally:
+                    if not in_place:
+                        in_map.close()
+                    out_map.close()
+        finally:
+            if not in_place:
+                fout.close()
+    return size
+
+
+def decrypt_file(input_path, output_path, key, nonce, counter=1, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Same as encrypt_file: XOR with the same keystream restores the data
+    """
+    return encrypt_file(input_path, output_path, key, nonce, counter, chunk_bytes)
+
+
+# Same interface as the bonus C++ tool: the first 32 bytes of the key file
+# and the first 12 bytes of the nonce file are used as raw bytes, anything
+# after them (such as a trailing newline) is ignored:
+#   python stream_cipher.py key.txt nonce.txt input [output] [--counter N]
+if __name__ == "__main__":
+    import sys
+    import time
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Encrypt or decrypt a file with ChaCha20")
+    parser.add_argument("key_file", help="File holding the 32-byte key")
+    parser.add_argument("nonce_file", help="File holding the 12-byte nonce")
+    parser.add_argument("input", help="File to encrypt or decrypt")
+    parser.add_argument("output", nargs="?", default="output.txt", help="Output file (default: output.txt)")
+    parser.add_argument("--counter", type=int, default=1, help="Block counter of the first 64 bytes (default: 1)")
+    args = parser.parse_args()
+
+    with open(args.key_file, "rb") as f:
+        key = f.read(32)
+    with open(args.nonce_file, "rb") as f:
+        nonce = f.read(12)
+    if len(key) != 32 or len(nonce) != 12:
+        print("Error: key file must contain at least 32 bytes and nonce file at least 12 bytes.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    size = encrypt_file(args.input, args.output, key, nonce, args.counter)
+    print(f"Operation complete: {size} bytes in {time.perf_counter() - start:.3f} s. Output saved to '{args.output}'.")
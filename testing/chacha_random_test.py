@@ -0,0 +1,48 @@
+# File: testing/chacha_random_test.py
+
+# Checks that ChaChaRandom consumes the ChaCha20 stream in order: mixed
+# small and large requests give the same bytes as one ChaChaPRNG stream,
+# and getstate records the right position.
+#
+#   python testing/chacha_random_test.py
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+
+from chacha20 import ChaChaPRNG
+from chacha_random import ChaChaRandom, BUFFER_BYTES
+
+KEY = bytes(range(32))
+NONCE = bytes(12)
+
+
+def test_mixed_requests_follow_the_stream():
+    sizes = [BUFFER_BYTES - 100, 70000, 8, 3, BUFFER_BYTES, 1, 2 * BUFFER_BYTES + 5, 64, 100]
+    rng = ChaChaRandom(key=KEY, nonce=NONCE)
+    output = b"".join(rng.randbytes(n) for n in sizes)
+
+    assert output == ChaChaPRNG(KEY, NONCE).generate_bytes(sum(sizes))
+    assert rng.getstate()[3] == sum(sizes)
+
+
+def test_setstate_resumes_after_large_request():
+    rng = ChaChaRandom(key=KEY, nonce=NONCE)
+    rng.randbytes(BUFFER_BYTES - 100)
+    rng.randbytes(70000)
+    rng.randbytes(8)
+    state = rng.getstate()
+    assert state[3] == BUFFER_BYTES - 100 + 70000 + 8
+
+    expected = rng.randbytes(1000)
+    rng.setstate(state)
+    assert rng.randbytes(1000) == expected
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ok")
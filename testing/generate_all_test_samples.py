@@ -6,36 +6,34 @@ import sys
 import argparse
 sys.path.append("..")  # So it can find chacha20.py, bbs.py, etc.
 
-from bitstring import BitArray
 from chacha20 import ChaChaPRNG
 from bbs import BlumBlumShubPRNG
-from primes import generate_blum_prime
+from prime_pool import take_blum_prime
+from output import BinarySink, write_stream
 
 DEFAULT_BITS = 1_000_000  # Default to 1 million bits
 OUTPUT_DIR = "diehard_inputs"
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def save_bin(bits: BitArray, filename: str):
+def save_bin(prng, bits: int, filename: str):
+    # Stream the output to disk chunk by chunk
     path = os.path.join(OUTPUT_DIR, filename)
-    with open(path, "wb") as f:
-        f.write(bits.tobytes())
+    write_stream(prng.iter_chunks(bits), bits, [BinarySink(path)])
     print(f"[✔] Saved: {path}")
 
 def generate_chacha(bits: int, label="chacha"):
     key = secrets.token_bytes(32)
     nonce = secrets.token_bytes(12)
     prng = ChaChaPRNG(key, nonce)
-    output = prng.generate_bits(bits)
-    save_bin(output, f"{label}_{bits}bits.bin")
+    save_bin(prng, bits, f"{label}_{bits}bits.bin")
 
 def generate_bbs(prime_size: int, bits: int, label="bbs"):
-    p = generate_blum_prime(prime_size)
-    q = generate_blum_prime(prime_size)
+    p = take_blum_prime(prime_size)
+    q = take_blum_prime(prime_size)
     seed = secrets.randbelow(p * q - 1) + 1
     prng = BlumBlumShubPRNG(p, q, seed)
-    output = prng.generate_bits(bits)
-    save_bin(output, f"{label}_{prime_size}bit_{bits}bits.bin")
+    save_bin(prng, bits, f"{label}_{prime_size}bit_{bits}bits.bin")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate PRNG bitstreams for Dieharder testing")
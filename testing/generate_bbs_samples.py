@@ -6,34 +6,32 @@ import secrets
 import sys
 sys.path.append("..")
 
-from bitstring import BitArray
-from bbs import BlumBlumShubPRNG
-from primes import generate_blum_prime
+from prime_pool import take_blum_prime
+from parallel import generate_bbs_file
 
 # Prime sizes to test
 PRIME_SIZES = [32, 64, 128, 256, 512, 768, 1024]
 BIT_COUNT = 100_000_000  # 100 million bits
 BIN_DIR = "bbs_analysis_data/binaries"
 TXT_PATH = "bbs_analysis_data/timing_results.txt"
+# Processes used per sample, each one jumps ahead to its own bit range
+WORKERS = os.cpu_count() or 1
 
 os.makedirs(BIN_DIR, exist_ok=True)
 
 def generate_bbs(bits, prime_size, label):
-    p = generate_blum_prime(prime_size)
-    q = generate_blum_prime(prime_size)
+    # refill_to=0: no background prime search competing with the timed run
+    p = take_blum_prime(prime_size, refill_to=0)
+    q = take_blum_prime(prime_size, refill_to=0)
     seed = secrets.randbelow(p * q - 1) + 1
-    prng = BlumBlumShubPRNG(p, q, seed)
+    bin_path = os.path.join(BIN_DIR, f"bbs_{label}_{prime_size}bit_{bits}bits.bin")
 
+    # Generate and save binary, same output as prng.generate_bits(bits)
     start = time.perf_counter()
-    bitstream = prng.generate_bits(bits)
+    generate_bbs_file(bin_path, p, q, seed, bits, workers=WORKERS)
     end = time.perf_counter()
     duration = end - start
 
-    # Save binary
-    bin_path = os.path.join(BIN_DIR, f"bbs_{label}_{prime_size}bit_{bits}bits.bin")
-    with open(bin_path, "wb") as f:
-        f.write(bitstream.tobytes())
-
     return duration
 
 if __name__ == "__main__":
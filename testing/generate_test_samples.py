@@ -7,32 +7,34 @@ import argparse
 import sys
 sys.path.append("..")  # so it can find chacha20.py, etc.
 
-from bitstring import BitArray
 from chacha20 import ChaChaPRNG
 from bbs import BlumBlumShubPRNG
 from primes import generate_blum_prime
+from parallel import generate_chacha_file
+from output import BinarySink, write_stream
 
 def generate_bbs(bits, prime_size, label):
     p = generate_blum_prime(prime_size)
     q = generate_blum_prime(prime_size)
     seed = secrets.randbelow(p * q - 1) + 1
     bbs = BlumBlumShubPRNG(p, q, seed)
-    out = bbs.generate_bits(bits)
 
     filename = f"bbs_{label}_{prime_size}bit_{bits}bits.bin"
-    with open(os.path.join("diehard_inputs", filename), "wb") as f:
-        f.write(out.tobytes())
+    write_stream(bbs.iter_chunks(bits), bits, [BinarySink(os.path.join("diehard_inputs", filename))])
     print(f"[✔] BBS output saved as {filename}")
 
-def generate_chacha(bits, label):
+def generate_chacha(bits, label, workers=1):
     key = secrets.token_bytes(32)
     nonce = secrets.token_bytes(12)
-    prng = ChaChaPRNG(key, nonce)
-    out = prng.generate_bits(bits)
-
     filename = f"chacha_{label}_{bits}bits.bin"
-    with open(os.path.join("diehard_inputs", filename), "wb") as f:
-        f.write(out.tobytes())
+    path = os.path.join("diehard_inputs", filename)
+
+    if workers > 1:
+        # Split the counter space across processes, same bytes as one PRNG
+        generate_chacha_file(path, key, nonce, bits, workers=workers)
+    else:
+        prng = ChaChaPRNG(key, nonce)
+        write_stream(prng.iter_chunks(bits), bits, [BinarySink(path)])
     print(f"[✔] ChaCha20 output saved as {filename}")
 
 if __name__ == "__main__":
@@ -41,6 +43,7 @@ if __name__ == "__main__":
     parser.add_argument("--label", type=str, default="test")
     parser.add_argument("--bits", type=int, default=1000000, help="Number of bits to generate (default: 1 million)")
     parser.add_argument("--prime_size", type=int, default=512, help="Bit size of primes for BBS")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes for ChaCha20 generation (default: 1)")
     args = parser.parse_args()
 
     os.makedirs("diehard_inputs", exist_ok=True)
@@ -48,4 +51,4 @@ if __name__ == "__main__":
     if args.type == "bbs":
         generate_bbs(bits=args.bits, prime_size=args.prime_size, label=args.label)
     elif args.type == "chacha":
-        generate_chacha(bits=args.bits, label=args.label)
+        generate_chacha(bits=args.bits, label=args.label, workers=args.workers)
@@ -0,0 +1,55 @@
+# File: testing/instrumentation_test.py
+
+# Checks of the ChaChaPRNG instrumentation counters: every output byte is
+# counted once, either as written directly or as copied.
+#
+#   python testing/instrumentation_test.py
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+
+from chacha20 import ChaChaPRNG
+
+KEY = bytes(range(32))
+NONCE = bytes(12)
+
+
+def test_counters_after_mixed_calls():
+    prng = ChaChaPRNG(KEY, NONCE, blocks_per_refill=16)
+    prng.enable_stats()
+
+    prng.generate_bytes(12501)
+    prng.readinto(bytearray(100))
+    prng.generate_bytes(3)
+    chunks = list(prng.iter_chunks(8 * 5000 + 3, chunk_bytes=1024))
+    prng.readinto(bytearray(64 * 40))
+    total = 12501 + 100 + 3 + 5001 + 64 * 40
+
+    counters = prng.stats()["counters"]
+    assert sum(len(chunk) for chunk in chunks) == 5001
+    assert counters["bytes_out"] == total
+    assert counters["bytes_direct"] + counters["bytes_copied"] == total
+    assert counters["readinto_calls"] == 4 + len(chunks)
+    assert counters["blocks"] * 64 - prng.tell() == len(prng.buffer) - prng.buffer_offset
+    assert prng.tell() == total
+
+
+def test_generate_bytes_copies_only_the_tail():
+    prng = ChaChaPRNG(KEY, NONCE)
+    prng.enable_stats()
+
+    prng.generate_bytes(12501)
+    counters = prng.stats()["counters"]
+    assert counters["bytes_out"] == 12501
+    assert counters["bytes_direct"] == 64 * (12501 // 64)
+    assert counters["bytes_copied"] == 12501 % 64
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ok")
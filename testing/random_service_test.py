@@ -0,0 +1,95 @@
+# File: testing/random_service_test.py
+
+# Checks of the randomness service clients: connections stay usable after
+# error responses and are dropped after interrupted requests. Each test
+# starts its own server on a temporary socket in a background thread.
+#
+#   python testing/random_service_test.py
+
+import os
+import sys
+import asyncio
+import tempfile
+import threading
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+
+from chacha20 import ChaChaPRNG
+from random_service import RandomServer, ClientPool, AsyncClientPool, MAX_REQUEST_BYTES
+
+KEY = bytes(range(32))
+NONCE = bytes(12)
+
+
+class ServerThread:
+    """
+    RandomServer serving ChaChaPRNG(KEY, NONCE) on its own event loop thread
+    """
+
+    def __init__(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "test.sock")
+        self.server = RandomServer(self.path, {"chacha": ChaChaPRNG(KEY, NONCE)})
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self.loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def test_client_pool_keeps_connection_after_error_response():
+    with ServerThread() as server:
+        with ClientPool(server.path, size=4) as pool:
+            first = pool.get_bytes(16)
+            assert len(pool._idle) == 1
+            client = pool._idle[0]
+
+            try:
+                pool.get_bytes(MAX_REQUEST_BYTES + 1)
+                raise AssertionError("oversized request was served")
+            except RuntimeError:
+                pass
+            assert pool._idle == [client]
+
+            try:
+                pool.get_bytes(16, "unknown")
+                raise AssertionError("unknown generator was served")
+            except KeyError:
+                pass
+            assert pool._idle == [client]
+
+            assert first + pool.get_bytes(16) == ChaChaPRNG(KEY, NONCE).generate_bytes(32)
+            assert pool._idle == [client]
+
+
+def test_async_pool_drops_connection_after_timeout():
+    async def run(path):
+        pool = await AsyncClientPool.open(path, 2)
+        for _ in range(3):
+            try:
+                await asyncio.wait_for(pool.get_bytes(MAX_REQUEST_BYTES), 0.001)
+            except asyncio.TimeoutError:
+                pass
+        results = await asyncio.gather(*(pool.get_bytes(16) for _ in range(20)))
+        await pool.close()
+        return results
+
+    with ServerThread() as server:
+        results = asyncio.run(run(server.path))
+    assert all(len(result) == 16 for result in results)
+    assert len(set(results)) == len(results)
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ok")
@@ -0,0 +1,305 @@
+# File: testing/run_tests.py
+
+# Run randomness tests over sample files in parallel, with cached results.
+#
+# Every (file, test) pair is a task for a process pool. A test is either
+# the built-in battery (statistical_battery.py) or an external command
+# such as dieharder. Results are cached under the SHA-256 of the file
+# contents plus the test definition, so unchanged samples are never tested
+# again, whatever their name or location. One aggregated report is
+# written as CSV (one row per p-value) and JSON (everything).
+#
+#   python testing/run_tests.py [files ...] [--builtin [tests ...]] [--dieharder [ids ...]] [--workers 4]
+#   python testing/run_tests.py --config tests.json
+#
+# Config file: {"tests": [...]}, each test one of
+#   {"name": "battery", "builtin": ["monobit", "runs", ...], "params": {"serial_m": 16, ...}}
+#   {"name": "dieharder_0", "command": "dieharder -d 0 -g 201 -f {file}", "timeout": 3600}
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import shlex
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+INPUT_GLOB = "diehard_inputs/*.bin"
+RESULTS_DIR = "diehard_results"
+CACHE_DIR = os.path.join(RESULTS_DIR, "cache")
+DIEHARDER_TESTS = [0, 2, 9, 10, 100]  # birthdays, rank, sums, runs, monobit
+HASH_CHUNK_BYTES = 1 << 22
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ResultCache:
+    """
+    Test results on disk, one JSON file per (content hash, test definition).
+    Also remembers file hashes by (path, size, modification time), so
+    unchanged files are not read again just to be hashed.
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "file_hashes.json")
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {}
+
+    @staticmethod
+    def _stamp(path):
+        stat = os.stat(path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def known_hash(self, path):
+        entry = self.index.get(os.path.abspath(path))
+        if entry is not None and entry["stamp"] == self._stamp(path):
+            return entry["sha256"]
+        return None
+
+    def remember_hash(self, path, digest):
+        self.index[os.path.abspath(path)] = {"stamp": self._stamp(path), "sha256": digest}
+
+    def save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def key(digest, test):
+        definition = json.dumps(test, sort_keys=True)
+        return hashlib.sha256(f"{digest}\n{definition}".encode()).hexdigest()
+
+    def get(self, digest, test):
+        try:
+            with open(os.path.join(self.directory, self.key(digest, test) + ".json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest, test, result):
+        path = os.path.join(self.directory, self.key(digest, test) + ".json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(result, f)
+        os.replace(path + ".tmp", path)
+
+
+"""
+Rows of a dieharder results table:
+  test_name |ntup| tsamples |psamples|  p-value |Assessment
+"""
+def parse_dieharder(output):
+    rows = []
+    for line in output.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) != 6:
+            continue
+        try:
+            p_value = float(fields[4])
+        except ValueError:
+            continue
+        rows.append({"subtest": f"{fields[0]} ntup={fields[1]}", "p_value": p_value,
+                     "passed": fields[5] != "FAILED", "assessment": fields[5]})
+    return rows
+
+
+def run_builtin(path, test):
+    """
+    Run the built-in battery, return (result rows, full battery report)
+    """
+    from statistical_battery import run_battery
+
+    report = run_battery(path, tests=test["builtin"], **test.get("params", {}))
+    rows = []
+    for name, result in report["tests"].items():
+        p_values = result.get("p_values", [result.get("p_value")])
+        alpha = report["alpha"]
+        for i, p in enumerate(p_values):
+            subtest = name if len(p_values) == 1 else f"{name}_{i + 1}"
+            rows.append({"subtest": subtest, "p_value": p, "passed": p >= alpha})
+    return rows, report
+
+
+def run_command(path, test, output_path):
+    """
+    Run an external test command on path, saving its output to output_path.
+    Returns (result rows, return code).
+    """
+    command = test["command"].format(file=shlex.quote(path))
+    result = subprocess.run(command, shell=True, capture_output=True, text=True,
+                            timeout=test.get("timeout"))
+    with open(output_path, "w") as f:
+        f.write(result.stdout)
+        f.write(result.stderr)
+    return parse_dieharder(result.stdout), result.returncode
+
+
+def run_task(path, digest, test, results_dir):
+    """
+    Worker: run one test on one file. Returns the task result, with an
+    "error" entry instead of rows when the test could not run.
+    """
+    start = time.perf_counter()
+    result = {"test": test["name"], "sha256": digest}
+    try:
+        if "builtin" in test:
+            result["rows"], result["report"] = run_builtin(path, test)
+        else:
+            base = os.path.splitext(os.path.basename(path))[0]
+            output_path = os.path.join(results_dir, f"{base}_{test['name']}.txt")
+            result["rows"], result["returncode"] = run_command(path, test, output_path)
+            result["output"] = output_path
+            if result["returncode"] != 0 and not result["rows"]:
+                result["error"] = f"command exited with status {result['returncode']}"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def build_tests(config_path=None, dieharder=None, builtin=None):
+    """
+    Test definitions from a config file, or from the command line options
+    (the built-in battery by default)
+    """
+    if config_path is not None:
+        with open(config_path) as f:
+            tests = json.load(f)["tests"]
+    else:
+        tests = []
+        if builtin is not None:
+            from statistical_battery import TESTS
+            unknown = set(builtin) - set(TESTS)
+            if unknown:
+                raise ValueError(f"Unknown built-in tests: {', '.join(sorted(unknown))} (choose from {', '.join(TESTS)}).")
+            tests.append({"name": "battery", "builtin": builtin or TESTS})
+        for test_id in dieharder or []:
+            tests.append({"name": f"dieharder_{test_id}",
+                          "command": f"dieharder -d {test_id} -g 201 -f {{file}}"})
+
+    names = [test["name"] for test in tests]
+    if len(set(names)) != len(names):
+        raise ValueError("Test names must be unique.")
+    for test in tests:
+        if ("builtin" in test) == ("command" in test):
+            raise ValueError(f"Test '{test['name']}' needs exactly one of 'builtin' or 'command'.")
+    return tests
+
+
+def run_all(files, tests, workers=None, cache_dir=CACHE_DIR, results_dir=RESULTS_DIR, force=False):
+    """
+    Run every test on every file over a process pool, reusing cached
+    results unless force is set. Files with identical contents are tested
+    once. Returns the list of task results.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    cache = ResultCache(cache_dir)
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Hash the files that changed since they were last seen
+        digests = {path: cache.known_hash(path) for path in files}
+        pending = {pool.submit(file_sha256, path): path for path, d in digests.items() if d is None}
+        for future in as_completed(pending):
+            path = pending[future]
+            digests[path] = future.result()
+            cache.remember_hash(path, digests[path])
+        cache.save_index()
+
+        # Files sharing the contents and test of each task to run
+        futures = {}
+        waiting = {}
+        for path in files:
+            for test in tests:
+                cached = None if force else cache.get(digests[path], test)
+                if cached is not None:
+                    results.append(dict(cached, file=path, cached=True))
+                    continue
+                key = cache.key(digests[path], test)
+                if key not in waiting:
+                    waiting[key] = []
+                    future = pool.submit(run_task, path, digests[path], test, results_dir)
+                    futures[future] = (key, test)
+                waiting[key].append(path)
+
+        for future in as_completed(futures):
+            key, test = futures[future]
+            result = future.result()
+            if "error" not in result:
+                cache.put(result["sha256"], test, result)
+            for i, path in enumerate(waiting[key]):
+                # Later files with the same contents reuse the result
+                results.append(dict(result, file=path, cached=i > 0))
+                status = "ERROR" if "error" in result else f"{result['seconds']:.1f} s"
+                print(f"[{len(results)}/{len(files) * len(tests)}] {path} {test['name']}: {status}")
+
+    results.sort(key=lambda r: (r["file"], r["test"]))
+    return results
+
+
+def write_reports(results, csv_path, json_path):
+    with open(json_path, "w") as f:
+        json.dump(results, f, indent=2)
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["file", "sha256", "test", "subtest", "p_value", "passed", "cached", "seconds", "error"])
+        for result in results:
+            common = [result["file"], result["sha256"], result["test"]]
+            tail = [result["cached"], f"{result['seconds']:.3f}", result.get("error", "")]
+            if not result.get("rows"):
+                writer.writerow(common + ["", "", ""] + tail)
+            for row in result.get("rows", []):
+                writer.writerow(common + [row["subtest"], f"{row['p_value']:.6f}", row["passed"]] + tail)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run randomness tests over sample files with cached results")
+    parser.add_argument("files", nargs="*", help=f"Sample files (default: {INPUT_GLOB})")
+    parser.add_argument("--config", type=str, default=None, help="JSON file with the test definitions")
+    parser.add_argument("--builtin", nargs="*", default=None, help="Built-in battery tests (no names: all)")
+    parser.add_argument("--dieharder", type=int, nargs="*", default=None, help=f"Dieharder test ids (no ids: {DIEHARDER_TESTS})")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--cache", type=str, default=CACHE_DIR, help=f"Cache directory (default: {CACHE_DIR})")
+    parser.add_argument("--results", type=str, default=RESULTS_DIR, help=f"Report and output directory (default: {RESULTS_DIR})")
+    parser.add_argument("--force", action="store_true", help="Ignore cached results")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(INPUT_GLOB))
+    if not files:
+        print("No sample files found.")
+        sys.exit(1)
+    dieharder = DIEHARDER_TESTS if args.dieharder == [] else args.dieharder
+    builtin = args.builtin
+    if args.config is None and builtin is None and dieharder is None:
+        builtin = []
+    tests = build_tests(args.config, dieharder, builtin)
+
+    start = time.perf_counter()
+    results = run_all(files, tests, args.workers, args.cache, args.results, args.force)
+    total = time.perf_counter() - start
+
+    csv_path = os.path.join(args.results, "report.csv")
+    json_path = os.path.join(args.results, "report.json")
+    write_reports(results, csv_path, json_path)
+
+    cached = sum(1 for r in results if r["cached"])
+    errors = sum(1 for r in results if "error" in r)
+    failed = sum(1 for r in results for row in r.get("rows", []) if not row["passed"])
+    print(f"\n{len(results)} tasks ({cached} cached, {errors} errors) in {total:.1f} s, {failed} failed p-values")
+    print(f"Report saved to {csv_path} and {json_path}")
+    sys.exit(1 if errors or failed else 0)
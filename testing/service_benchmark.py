@@ -0,0 +1,117 @@
+# File: testing/service_benchmark.py
+
+# Load test for the randomness service (random_service.py): concurrent
+# asyncio clients send requests for a fixed duration and every request's
+# latency is recorded. Reports requests/s, MB/s, latency percentiles and
+# how many requests the server served per generation (batching).
+#
+# Starts its own server in a subprocess unless --socket points at a
+# running one. Run once with --max-batch 1 to see the effect of batching.
+#
+#   python testing/service_benchmark.py [--clients 64] [--connections 16] [--size 32] [--duration 5]
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+
+from random_service import AsyncClientPool, DEFAULT_MAX_BATCH
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of sorted values
+    """
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def start_server(path, max_batch, bbs_prime_bits, timeout=60):
+    """
+    Start random_service.py in a subprocess and wait for its socket
+    """
+    command = [sys.executable, os.path.join(REPO_DIR, "random_service.py"),
+               "--socket", path, "--max-batch", str(max_batch)]
+    if bbs_prime_bits:
+        command += ["--bbs", str(bbs_prime_bits)]
+    server = subprocess.Popen(command, cwd=REPO_DIR, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if server.poll() is not None or time.monotonic() > deadline:
+            server.kill()
+            raise RuntimeError("Randomness server did not start.")
+        time.sleep(0.05)
+    return server
+
+
+async def load(path, clients, connections, size, generator, duration):
+    """
+    Run clients coroutines sending requests over a pool of connections for
+    duration seconds. Returns (sorted latencies in seconds, elapsed
+    seconds, server stats).
+    """
+    pool = await AsyncClientPool.open(path, connections)
+    before = await pool.stats()
+    latencies = []
+    stop = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            await pool.get_bytes(size, generator)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    after = await pool.stats()
+    await pool.close()
+
+    # Server counters during this run only
+    counters = {name: after["counters"].get(name, 0) - before["counters"].get(name, 0)
+                for name in after["counters"]}
+    latencies.sort()
+    return latencies, elapsed, counters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the randomness service")
+    parser.add_argument("--socket", type=str, default=None, help="Socket of a running server (default: start one)")
+    parser.add_argument("--clients", type=int, default=64, help="Concurrent clients")
+    parser.add_argument("--connections", type=int, default=16, help="Pooled connections")
+    parser.add_argument("--size", type=int, default=32, help="Bytes per request")
+    parser.add_argument("--generator", choices=["chacha", "bbs"], default="chacha", help="Generator to request from")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of load")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Server batch limit (own server only)")
+    parser.add_argument("--bbs", type=int, default=512, help="BBS prime size of the own server")
+    args = parser.parse_args()
+
+    server = None
+    path = args.socket
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "bench.sock")
+        server = start_server(path, args.max_batch, args.bbs if args.generator == "bbs" else None)
+    try:
+        latencies, elapsed, counters = asyncio.run(
+            load(path, args.clients, args.connections, args.size, args.generator, args.duration))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    count = len(latencies)
+    print(f"{count} requests of {args.size} bytes in {elapsed:.2f} s "
+          f"({args.clients} clients, {args.connections} connections, {args.generator})")
+    print(f"  {count / elapsed:,.0f} req/s, {count * args.size / elapsed / 1e6:.2f} MB/s")
+    print("  latency: " + ", ".join(f"{label} {percentile(latencies, fraction) * 1e3:.3f} ms"
+                                   for label, fraction in (("p50", 0.50), ("p99", 0.99), ("p99.9", 0.999))))
+    if counters.get("batches"):
+        # The stats requests themselves are counted too, outside batches
+        print(f"  server: {counters['batches']} generations, "
+              f"{counters['requests'] / counters['batches']:.1f} requests per generation")
@@ -0,0 +1,91 @@
+# File: testing/startup_benchmark.py
+
+# Measure cold start time of each entry point: a fresh interpreter importing
+# the module, like `python -X importtime`. Reports median wall time, the
+# slowest imports and whether a short cha_gen.py run (import plus a first
+# ChaChaPRNG output, which is where lazy imports are paid) meets its
+# startup target.
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 10
+# Cold start target for a short cha_gen.py run, in milliseconds
+CHA_GEN_TARGET_MS = 100
+
+ENTRY_POINTS = [
+    {"label": "cha_gen.py", "code": "import cha_gen"},
+    {"label": "cha_gen.py + 16 bytes",
+     "code": "import cha_gen; cha_gen.ChaChaPRNG(bytes(32), bytes(12)).generate_bytes(16)",
+     "target_ms": CHA_GEN_TARGET_MS},
+    {"label": "bbs_gen.py", "code": "import bbs_gen"},
+    {"label": "generator.py", "code": "import generator"},
+    {"label": "chacha20", "code": "import chacha20"},
+    {"label": "bbs", "code": "import bbs"},
+    {"label": "primes", "code": "import primes"},
+]
+
+def run_once(code):
+    """
+    Run code in a fresh interpreter with -X importtime.
+    Returns (wall time in seconds, importtime report lines).
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    end = time.perf_counter()
+    return end - start, result.stderr.splitlines()
+
+def slowest_imports(lines, count):
+    """
+    Parse -X importtime output, return the count largest (cumulative us, module)
+    """
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+def baseline():
+    """
+    Median wall time of an interpreter doing nothing
+    """
+    times = [run_once("pass")[0] for _ in range(RUNS)]
+    return statistics.median(times)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cold start of the generator entry points")
+    parser.add_argument("--runs", type=int, default=RUNS, help="Runs per entry point (default: 10)")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports to show (default: 5)")
+    args = parser.parse_args()
+    RUNS = args.runs
+
+    empty = baseline()
+    print(f"Bare interpreter: {empty * 1000:.1f} ms\n")
+
+    failed = False
+    for entry in ENTRY_POINTS:
+        times = []
+        for _ in range(args.runs):
+            duration, lines = run_once(entry["code"])
+            times.append(duration)
+        median = statistics.median(times)
+
+        line = f"{entry['label']}: {median * 1000:.1f} ms ({(median - empty) * 1000:.1f} ms over bare interpreter)"
+        if "target_ms" in entry:
+            ok = median * 1000 < entry["target_ms"]
+            failed = failed or not ok
+            line += f" [target {entry['target_ms']} ms: {'OK' if ok else 'MISSED'}]"
+        print(line)
+        for cumulative, name in slowest_imports(lines, args.top):
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+        print()
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,466 @@
+# File: testing/statistical_battery.py
+
+# Statistical test battery in the style of NIST SP 800-22, run directly on
+# .bin sample files (e.g. diehard_inputs/):
+#   - monobit (frequency)
+#   - block frequency
+#   - runs
+#   - longest run of ones in a block
+#   - serial
+#   - approximate entropy
+#   - cumulative sums (forward and backward)
+#
+# The file is memory-mapped and read once, chunk by chunk. Every test is
+# computed on whole bytes with NumPy lookup tables (popcounts, bit
+# transitions, runs of ones, partial sum extremes per byte value), so the
+# bits are never unpacked one by one. Serial and approximate entropy
+# pattern counts come from one histogram of byte triples; they are the
+# most expensive tests, skip them with --tests when not needed.
+# Only whole bytes are tested: a sample is 8 * file size bits (or --bits,
+# rounded down to a byte).
+#
+#   python testing/statistical_battery.py diehard_inputs/*.bin [--json results.json]
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import numpy as np
+
+ALPHA = 0.01
+CHUNK_BYTES = 1 << 24
+BLOCK_FREQUENCY_M = 128
+SERIAL_M = 16
+APEN_M = 10
+# Window counts are taken from 3 consecutive bytes, which limits m
+MAX_PATTERN_BITS = 17
+TESTS = ["monobit", "block_frequency", "runs", "longest_run", "serial",
+         "approximate_entropy", "cumulative_sums"]
+
+# Longest run test parameters by minimum n (NIST SP 800-22, 2.4):
+# block size M, class boundaries (v <= first ... v >= last)
+LONGEST_RUN_PARAMS = [
+    (750_000, 10_000, [10, 11, 12, 13, 14, 15, 16]),
+    (6_272, 128, [4, 5, 6, 7, 8, 9]),
+    (128, 8, [1, 2, 3, 4]),
+]
+
+
+"""
+Per byte value tables, bits read most significant first. Small dtypes
+keep the lookups on large chunks cheap.
+"""
+def _byte_tables():
+    values = np.arange(256)
+    bits = ((values[:, None] >> np.arange(7, -1, -1)) & 1).astype(np.int16)
+
+    popcount = bits.sum(axis=1)
+    # Adjacent bit pairs inside the byte that differ
+    transitions = (bits[:, 1:] != bits[:, :-1]).sum(axis=1)
+
+    lead = np.zeros(256, dtype=np.int32)
+    trail = np.zeros(256, dtype=np.int32)
+    inner = np.zeros(256, dtype=np.int32)
+    for v in range(256):
+        row = bits[v]
+        lead[v] = next((i for i in range(8) if row[i] == 0), 8)
+        trail[v] = next((i for i in range(8) if row[7 - i] == 0), 8)
+        run = 0
+        for bit in row:
+            run = run + 1 if bit else 0
+            inner[v] = max(inner[v], run)
+
+    # Tables on 16-bit values of two consecutive bytes (first byte high):
+    # transitions inside the first byte and between the two bytes, and
+    # the longest run of ones inside the pair
+    first, second = np.arange(1 << 16) >> 8, np.arange(1 << 16) & 0xff
+    pair_transitions = transitions[first] + ((first & 1) != (second >> 7))
+    pair_longest = np.maximum(np.maximum(inner[first], inner[second]), trail[first] + lead[second])
+
+    # Partial sums of +-1 steps: p_0 = 0, p_k after k bits
+    partial = np.concatenate([np.zeros((256, 1), dtype=np.int16),
+                              np.cumsum(2 * bits - 1, axis=1)], axis=1)
+    return {
+        "popcount": popcount.astype(np.uint8),
+        "transitions": transitions.astype(np.int64),
+        "lead": lead.astype(np.uint8),
+        "trail": trail.astype(np.uint8),
+        "inner": inner.astype(np.uint8),
+        "pair_transitions": pair_transitions.astype(np.uint8),
+        "pair_longest": pair_longest.astype(np.uint8),
+        # over p_1..p_8 (forward sums) and p_0..p_7 (backward sums)
+        "fmax": partial[:, 1:].max(axis=1).astype(np.int32),
+        "fmin": partial[:, 1:].min(axis=1).astype(np.int32),
+        "bmax": partial[:, :-1].max(axis=1).astype(np.int32),
+        "bmin": partial[:, :-1].min(axis=1).astype(np.int32),
+    }
+
+TABLES = _byte_tables()
+
+
+def igamc(a, x):
+    """
+    Regularized upper incomplete gamma function Q(a, x)
+    (series for x < a + 1, continued fraction otherwise)
+    """
+    if x <= 0:
+        return 1.0
+    log_prefactor = a * math.log(x) - x - math.lgamma(a)
+
+    if x < a + 1:
+        # P(a, x) = x^a e^-x / Gamma(a) * sum x^k / (a (a+1) ... (a+k))
+        term = total = 1.0 / a
+        ap = a
+        while abs(term) > abs(total) * 1e-15:
+            ap += 1
+            term *= x / ap
+            total += term
+        return max(0.0, 1.0 - total * math.exp(log_prefactor))
+
+    # Modified Lentz evaluation of the continued fraction for Q(a, x)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    i = 1
+    while True:
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+        i += 1
+    return h * math.exp(log_prefactor)
+
+
+def _normal_cdf(x):
+    return 0.5 * math.erfc(-x / math.sqrt(2))
+
+
+"""
+Cumulative sums p-value for n steps and maximum excursion z (NIST 2.13).
+Terms more than 10 standard deviations out are negligible and skipped.
+"""
+def _cusum_p_value(n, z):
+    sqrt_n = math.sqrt(n)
+    k_limit = int(10 * sqrt_n / z / 4) + 2
+    k_max = min(int((n / z - 1) / 4), k_limit)
+
+    total = 1.0
+    for k in range(max(int((-n / z + 1) / 4), -k_limit), k_max + 1):
+        total -= _normal_cdf((4 * k + 1) * z / sqrt_n) - _normal_cdf((4 * k - 1) * z / sqrt_n)
+    for k in range(max(int((-n / z - 3) / 4), -k_limit), k_max + 1):
+        total += _normal_cdf((4 * k + 3) * z / sqrt_n) - _normal_cdf((4 * k + 1) * z / sqrt_n)
+    return min(1.0, max(0.0, total))
+
+
+def longest_run_probabilities(m, classes):
+    """
+    Exact class probabilities of the longest run of ones in m random bits.
+    NIST tabulates them to 4 decimals, which is not accurate enough once a
+    large file has hundreds of thousands of blocks.
+    """
+    def at_most(r):
+        # a[i]: probability that i bits hold no run longer than r
+        # (first zero after k <= r ones, then the remaining i - k - 1 bits)
+        a = [1.0] * (r + 1)
+        for i in range(r + 1, m + 1):
+            a.append(sum(a[i - k - 1] / 2 ** (k + 1) for k in range(r + 1)))
+        return a[m]
+
+    cumulative = [at_most(c) for c in classes[:-1]] + [1.0]
+    return [cumulative[0]] + [cumulative[i] - cumulative[i - 1] for i in range(1, len(classes))]
+
+
+"""
+16-bit big-endian values of bytes (j, j+1) for every j in the rows of
+a 2D byte array (a view, nothing is copied)
+"""
+def _byte_pairs(rows):
+    return np.ndarray(shape=(rows.shape[0], rows.shape[1] - 1), dtype='>u2',
+                      buffer=rows, strides=(rows.strides[0], 1))
+
+
+"""
+Longest run of ones inside each block, capped at cap (<= 16): rows of
+'blocks' (C-contiguous) are the bytes of one block. A run of 15 or more
+ones always covers a whole 0xff byte, so below the cap it lies within
+two consecutive bytes, or is trailing ones + a single 0xff byte +
+leading ones. Two 0xff bytes in a row already reach the cap.
+"""
+def _longest_runs(blocks, cap):
+    if blocks.shape[1] == 1:
+        longest = TABLES["inner"][blocks[:, 0]]
+    else:
+        longest = TABLES["pair_longest"][_byte_pairs(blocks)].max(axis=1)
+
+        # Lone 0xff bytes inside the block (rare, handled sparsely)
+        rows, cols = np.nonzero(blocks[:, 1:-1] == 0xff)
+        if len(rows):
+            through = (TABLES["trail"][blocks[rows, cols]].astype(np.int32) + 8
+                       + TABLES["lead"][blocks[rows, cols + 2]])
+            longest = longest.astype(np.int32)
+            np.maximum.at(longest, rows, through)
+    return np.minimum(longest, cap)
+
+
+def _triple_histogram(data, start, stop, num_bytes):
+    """
+    Histogram of the 24-bit values of bytes (j, j+1, j+2) for every j in
+    [start, stop), the sequence wrapping around to its first bytes
+    """
+    if stop + 3 <= num_bytes:
+        window = np.asarray(data[start:stop + 3])
+    else:
+        head = np.resize(np.asarray(data[:3]), 3)
+        window = np.concatenate([data[start:num_bytes], head])[:stop - start + 3]
+    # Big-endian 32-bit words starting at every byte (unaligned view)
+    words = np.ndarray(shape=(stop - start,), dtype='>u4', buffer=window, strides=(1,))
+    return np.bincount(words >> 8, minlength=1 << 24)
+
+
+def _pattern_counts(triples, m):
+    """
+    Counts of the m-bit patterns (m <= 17) starting at every bit, from the
+    byte triple histogram: a pattern starting at bit s of byte j lies in
+    bytes j, j+1, j+2
+    """
+    values = np.arange(1 << 24, dtype=np.uint32)
+    mask = (1 << m) - 1
+    counts = np.zeros(1 << m, dtype=np.int64)
+    used = triples > 0
+    values, weights = values[used], triples[used]
+    for shift in range(8):
+        counts += np.bincount((values >> (24 - m - shift)) & mask, weights=weights,
+                              minlength=1 << m).round().astype(np.int64)
+    return counts
+
+
+"""
+Fold counts of m-bit patterns into counts of their first k bits
+"""
+def _fold_counts(counts, m, k):
+    if k <= 0:
+        return np.array([counts.sum()])
+    return counts.reshape(1 << k, 1 << (m - k)).sum(axis=1)
+
+
+def _psi_squared(counts, n):
+    return (len(counts) / n) * float((counts.astype(np.float64) ** 2).sum()) - n if len(counts) > 1 else 0.0
+
+
+def _phi(counts, n):
+    nonzero = counts[counts > 0].astype(np.float64) / n
+    return float((nonzero * np.log(nonzero)).sum())
+
+
+def run_battery(path, num_bits=None, tests=None, block_size=BLOCK_FREQUENCY_M,
+                serial_m=SERIAL_M, apen_m=APEN_M, alpha=ALPHA, chunk_bytes=CHUNK_BYTES):
+    """
+    Run the battery on the .bin file at path in one pass.
+    num_bits: bits to test (default: the whole file), rounded down to a byte
+    tests: names from TESTS to run (default: all)
+    block_size: block frequency block size M, a multiple of 8
+    serial_m, apen_m: pattern lengths, reduced to the NIST limits for n
+        (m < log2(n) - 2 for serial, m < log2(n) - 5 for approximate entropy)
+    Returns {test name: {"p_value" or "p_values", "passed", statistics}}.
+    """
+    tests = list(TESTS if tests is None else tests)
+    unknown = set(tests) - set(TESTS)
+    if unknown:
+        raise ValueError(f"Unknown tests: {', '.join(sorted(unknown))}.")
+    if block_size % 8:
+        raise ValueError("Block frequency block size must be a multiple of 8.")
+
+    num_bytes = os.path.getsize(path)
+    if num_bits is not None:
+        num_bytes = min(num_bytes, num_bits // 8)
+    n = 8 * num_bytes
+    if n < 128:
+        raise ValueError("At least 128 bits are needed.")
+    data = np.memmap(path, dtype=np.uint8, mode="r", shape=(num_bytes,))
+
+    # Pattern lengths and longest run block size for this n
+    log_n = int(math.log2(n))
+    serial_m = max(2, min(serial_m, log_n - 3))
+    apen_m = max(1, min(apen_m, log_n - 6))
+    pattern_bits = max(serial_m if "serial" in tests else 0,
+                       apen_m + 1 if "approximate_entropy" in tests else 0)
+    if pattern_bits > MAX_PATTERN_BITS:
+        raise ValueError(f"Pattern lengths above {MAX_PATTERN_BITS} bits are not supported.")
+    run_n, run_m, run_classes = next(p for p in LONGEST_RUN_PARAMS if n >= p[0])
+
+    # Chunks hold whole blocks of both block tests
+    block_bytes = block_size // 8
+    run_bytes = run_m // 8
+    align = block_bytes * run_bytes // math.gcd(block_bytes, run_bytes)
+    chunk_bytes = max(align, chunk_bytes // align * align)
+
+    ones = 0
+    # Block frequency: number of blocks and sum of (ones / M - 1/2)^2
+    blocks = 0
+    block_deviation = 0.0
+    transitions = 0
+    run_histogram = np.zeros(len(run_classes), dtype=np.int64)
+    triples = np.zeros(1 << 24, dtype=np.int64) if pattern_bits else None
+    # Partial sums: running total, extremes of p_1..p_n and of p_0..p_(n-1)
+    total = 0
+    fmax = fmin = None
+    bmax = bmin = 0
+
+    for start in range(0, num_bytes, chunk_bytes):
+        stop = min(start + chunk_bytes, num_bytes)
+        chunk = np.asarray(data[start:stop])
+        popcounts = TABLES["popcount"][chunk]
+        ones += int(popcounts.sum(dtype=np.int64))
+
+        if "block_frequency" in tests:
+            whole = len(chunk) // block_bytes * block_bytes
+            counts = popcounts[:whole].reshape(-1, block_bytes).sum(axis=1, dtype=np.int32)
+            blocks += len(counts)
+            block_deviation += float(((counts / block_size - 0.5) ** 2).sum())
+
+        if "runs" in tests:
+            # Every byte with the next one (the first byte of the next chunk
+            # for the last), the last byte of the file on its own
+            window = np.asarray(data[start:min(stop + 1, num_bytes)])
+            pairs = _byte_pairs(window.reshape(1, -1))[0]
+            transitions += int(TABLES["pair_transitions"][pairs].sum(dtype=np.int64))
+            if stop == num_bytes:
+                transitions += int(TABLES["transitions"][chunk[-1]])
+
+        if "longest_run" in tests:
+            whole = len(chunk) // run_bytes * run_bytes
+            if whole:
+                longest = _longest_runs(chunk[:whole].reshape(-1, run_bytes), run_classes[-1])
+                classes = np.maximum(longest, run_classes[0]) - run_classes[0]
+                run_histogram += np.bincount(classes, minlength=len(run_classes))
+
+        if triples is not None:
+            triples += _triple_histogram(data, start, stop, num_bytes)
+
+        if "cumulative_sums" in tests:
+            # Partial sums at byte boundaries, relative to the chunk start
+            steps = popcounts.astype(np.int8) * 2 - 8
+            ends = np.cumsum(steps, dtype=np.int32)
+            before = ends - steps
+            # Within a byte the sum moves at most 8 from its value before
+            # the byte, so only bytes starting near the extremes can hold them
+            high = np.flatnonzero(before >= int(ends.max()) - 16)
+            low = np.flatnonzero(before <= int(ends.min()) + 16)
+            chunk_fmax = total + int((before[high] + TABLES["fmax"][chunk[high]]).max())
+            chunk_fmin = total + int((before[low] + TABLES["fmin"][chunk[low]]).min())
+            fmax = chunk_fmax if fmax is None else max(fmax, chunk_fmax)
+            fmin = chunk_fmin if fmin is None else min(fmin, chunk_fmin)
+            bmax = max(bmax, total + int((before[high] + TABLES["bmax"][chunk[high]]).max()))
+            bmin = min(bmin, total + int((before[low] + TABLES["bmin"][chunk[low]]).min()))
+            total += int(ends[-1])
+
+    results = {}
+
+    if "monobit" in tests:
+        s_obs = abs(2 * ones - n) / math.sqrt(n)
+        p = math.erfc(s_obs / math.sqrt(2))
+        results["monobit"] = {"p_value": p, "ones": ones, "s_obs": s_obs}
+
+    if "block_frequency" in tests:
+        chi_squared = 4 * block_size * block_deviation
+        p = igamc(blocks / 2, chi_squared / 2)
+        results["block_frequency"] = {"p_value": p, "block_size": block_size,
+                                      "blocks": blocks, "chi_squared": chi_squared}
+
+    if "runs" in tests:
+        pi = ones / n
+        runs = transitions + 1
+        if abs(pi - 0.5) >= 2 / math.sqrt(n):
+            # Frequency prerequisite failed, the runs test is not applicable
+            p = 0.0
+        else:
+            p = math.erfc(abs(runs - 2 * n * pi * (1 - pi)) / (2 * math.sqrt(2 * n) * pi * (1 - pi)))
+        results["runs"] = {"p_value": p, "runs": runs}
+
+    if "longest_run" in tests:
+        run_blocks = int(run_histogram.sum())
+        expected = run_blocks * np.array(longest_run_probabilities(run_m, run_classes))
+        chi_squared = float(((run_histogram - expected) ** 2 / expected).sum())
+        p = igamc((len(run_classes) - 1) / 2, chi_squared / 2)
+        results["longest_run"] = {"p_value": p, "block_size": run_m, "blocks": run_blocks,
+                                  "histogram": run_histogram.tolist(), "chi_squared": chi_squared}
+
+    if triples is not None:
+        patterns = _pattern_counts(triples, pattern_bits)
+
+    if "serial" in tests:
+        psi = [_psi_squared(_fold_counts(patterns, pattern_bits, serial_m - i), n) for i in range(3)]
+        delta1 = psi[0] - psi[1]
+        delta2 = psi[0] - 2 * psi[1] + psi[2]
+        p1 = igamc(2 ** (serial_m - 2), delta1 / 2)
+        p2 = igamc(2 ** (serial_m - 3), delta2 / 2)
+        results["serial"] = {"p_values": [p1, p2], "m": serial_m,
+                             "delta_psi_squared": [delta1, delta2]}
+
+    if "approximate_entropy" in tests:
+        phi_m = _phi(_fold_counts(patterns, pattern_bits, apen_m), n)
+        phi_m1 = _phi(_fold_counts(patterns, pattern_bits, apen_m + 1), n)
+        apen = phi_m - phi_m1
+        chi_squared = 2 * n * (math.log(2) - apen)
+        p = igamc(2 ** (apen_m - 1), chi_squared / 2)
+        results["approximate_entropy"] = {"p_value": p, "m": apen_m, "apen": apen,
+                                          "chi_squared": chi_squared}
+
+    if "cumulative_sums" in tests:
+        z_forward = max(abs(fmax), abs(fmin))
+        z_backward = max(abs(total - bmin), abs(bmax - total))
+        results["cumulative_sums"] = {
+            "p_values": [_cusum_p_value(n, z_forward), _cusum_p_value(n, z_backward)],
+            "z": [z_forward, z_backward],
+        }
+
+    for result in results.values():
+        p_values = result.get("p_values", [result.get("p_value")])
+        result["passed"] = all(p >= alpha for p in p_values)
+    return {"file": path, "bits": n, "alpha": alpha, "tests": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NIST SP 800-22 style tests on .bin files")
+    parser.add_argument("files", nargs="+", help=".bin sample files")
+    parser.add_argument("--bits", type=int, default=None, help="Bits to test per file (default: whole file)")
+    parser.add_argument("--tests", nargs="+", choices=TESTS, default=None, help="Tests to run (default: all)")
+    parser.add_argument("--block-size", type=int, default=BLOCK_FREQUENCY_M, help=f"Block frequency block size (default: {BLOCK_FREQUENCY_M})")
+    parser.add_argument("--serial-m", type=int, default=SERIAL_M, help=f"Serial test pattern length (default: {SERIAL_M})")
+    parser.add_argument("--apen-m", type=int, default=APEN_M, help=f"Approximate entropy pattern length (default: {APEN_M})")
+    parser.add_argument("--alpha", type=float, default=ALPHA, help=f"Significance level (default: {ALPHA})")
+    parser.add_argument("--json", type=str, default=None, help="Save all results to this JSON file")
+    args = parser.parse_args()
+
+    reports = []
+    failed = False
+    for path in args.files:
+        start = time.perf_counter()
+        report = run_battery(path, args.bits, args.tests, args.block_size,
+                             args.serial_m, args.apen_m, args.alpha)
+        report["seconds"] = time.perf_counter() - start
+        reports.append(report)
+
+        print(f"\n{path}: {report['bits']:,} bits in {report['seconds']:.2f} s")
+        for name, result in report["tests"].items():
+            p_values = result.get("p_values", [result.get("p_value")])
+            status = "PASS" if result["passed"] else "FAIL"
+            failed = failed or not result["passed"]
+            print(f"  {name:<22} {'  '.join(f'{p:.6f}' for p in p_values):<20} {status}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\nResults saved to: {args.json}")
+    sys.exit(1 if failed else 0)
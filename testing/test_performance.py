@@ -1,67 +1,279 @@
 # File: testing/test_performance.py
 
-# Code to test timing performance of:
-#   - Chacha
-#   - BBS-weak(128 bit primes)
-#   - BBS-strong(1024 bit primes)
+# Benchmark suite for the PRNGs:
+#   - chacha20_block
+#   - ChaChaPRNG.generate_bytes / generate_bits / generate_string
+#   - BlumBlumShubPRNG at each prime size (128, 512, 1024 bit primes)
+#   - generate_blum_prime / find_blum_prime
+#   - streaming output to .bin and .txt files
+#
+# Every case runs warm-up rounds, then several timed repetitions. Setup
+# (key generation, prime generation, PRNG construction) happens outside the
+# timed region. Reports median, p95, min and throughput in MB/s, plus the
+# peak memory allocated by Python (tracemalloc) in one extra untimed run.
+#
+#   python testing/test_performance.py [--quick] [--json results.json]
+#   python testing/test_performance.py --compare baseline.json [--threshold 0.10]
 
+import os
+import sys
+import json
 import time
 import secrets
-import sys
-sys.path.append("..")
+import platform
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
 
-from chacha20 import ChaChaPRNG
+from chacha20 import ChaChaPRNG, chacha20_block
 from bbs import BlumBlumShubPRNG
-from primes import generate_blum_prime
-
-BIT_SIZES = [1_000_000, 10_000_000, 100_000_000]
-PRNGS = [
-    {"label": "chacha", "type": "chacha"},
-    {"label": "bbs_weak", "type": "bbs", "prime_size": 128},
-    {"label": "bbs_strong", "type": "bbs", "prime_size": 1024},
-]
-
-results = []
-
-def time_chacha(bits):
-    key = secrets.token_bytes(32)
-    nonce = secrets.token_bytes(12)
-    prng = ChaChaPRNG(key, nonce)
-    start = time.perf_counter()
-    prng.generate_bits(bits)
-    end = time.perf_counter()
-    return end - start
-
-def time_bbs(bits, prime_size):
-    p = generate_blum_prime(prime_size)
-    q = generate_blum_prime(prime_size)
-    seed = secrets.randbelow(p * q - 1) + 1
-    prng = BlumBlumShubPRNG(p, q, seed)
-    start = time.perf_counter()
-    prng.generate_bits(bits)
-    end = time.perf_counter()
-    return end - start
+from primes import generate_blum_prime, find_blum_prime
+from prime_pool import take_blum_prime
+from output import BinarySink, BitTextSink, write_stream
+
+JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "performance_results.json")
+WARMUP = 1
+REPEATS = 5
+# A case is a regression when its median is this much slower than the baseline
+THRESHOLD = 0.10
+
+# Sizes: (default, --quick)
+CHACHA_BLOCKS = (10_000, 1_000)
+CHACHA_BITS = ([1_000_000, 10_000_000, 100_000_000], [1_000_000])
+CHACHA_STRING_BITS = (1_000_000, 100_000)
+BBS_PRIME_SIZES = [128, 512, 1024]
+BBS_BITS = (100_000, 10_000)
+PRIME_SIZES = ([512, 1024], [512])
+FILE_BITS = (80_000_000, 8_000_000)
+
+
+def _chacha():
+    return ChaChaPRNG(secrets.token_bytes(32), secrets.token_bytes(12))
+
+
+# (p, q) by prime size, drawn from the pool once per size
+_bbs_primes = {}
+
+
+def _bbs(prime_size):
+    # Taking new primes in every setup would drain the pool and start refill
+    # processes competing with the timed runs, so the first (untimed) setup
+    # of a size draws them for all its runs
+    if prime_size not in _bbs_primes:
+        _bbs_primes[prime_size] = (take_blum_prime(prime_size, refill_to=0),
+                                   take_blum_prime(prime_size, refill_to=0))
+    p, q = _bbs_primes[prime_size]
+    seed = secrets.randbelow(p * q - 2) + 2
+    return BlumBlumShubPRNG(p, q, seed)
+
+
+def _write_files(prng, bits, directory):
+    sinks = [BinarySink(os.path.join(directory, "bench.bin")),
+             BitTextSink(os.path.join(directory, "bench.txt"))]
+    write_stream(prng.iter_chunks(bits), bits, sinks)
+
+
+def build_cases(quick, directory):
+    """
+    Return the benchmark cases as dicts:
+        name: unique case name (key in the JSON output and baseline)
+        setup: untimed, called before every run, returns the argument of run
+        run: the timed call
+        bytes: bytes produced per run (for MB/s), None if not meaningful
+    """
+    pick = 1 if quick else 0
+    key, nonce = secrets.token_bytes(32), secrets.token_bytes(12)
+    cases = []
+
+    blocks = CHACHA_BLOCKS[pick]
+    cases.append({
+        "name": f"chacha20_block x{blocks}",
+        "setup": lambda: None,
+        "run": lambda _: [chacha20_block(key, counter, nonce) for counter in range(blocks)],
+        "bytes": 64 * blocks,
+    })
+
+    for bits in CHACHA_BITS[pick]:
+        cases.append({
+            "name": f"chacha generate_bytes {bits // 8:,}B",
+            "setup": _chacha,
+            "run": lambda prng, n=bits // 8: prng.generate_bytes(n),
+            "bytes": bits // 8,
+        })
+        cases.append({
+            "name": f"chacha generate_bits {bits:,}",
+            "setup": _chacha,
+            "run": lambda prng, n=bits: prng.generate_bits(n),
+            "bytes": bits // 8,
+        })
+
+    bits = CHACHA_STRING_BITS[pick]
+    cases.append({
+        "name": f"chacha generate_string {bits:,}",
+        "setup": _chacha,
+        "run": lambda prng, n=bits: prng.generate_string(n),
+        "bytes": bits // 8,
+    })
+
+    bits = BBS_BITS[pick]
+    for size in BBS_PRIME_SIZES:
+        cases.append({
+            "name": f"bbs {size}-bit generate_bits {bits:,}",
+            "setup": lambda size=size: _bbs(size),
+            "run": lambda prng, n=bits: prng.generate_bits(n),
+            "bytes": bits // 8,
+        })
+
+    for size in PRIME_SIZES[pick]:
+        cases.append({
+            "name": f"generate_blum_prime {size}-bit",
+            "setup": lambda: None,
+            "run": lambda _, size=size: generate_blum_prime(size),
+            "bytes": None,
+        })
+        cases.append({
+            "name": f"find_blum_prime {size}-bit",
+            "setup": lambda: None,
+            "run": lambda _, size=size: find_blum_prime(size),
+            "bytes": None,
+        })
+
+    bits = FILE_BITS[pick]
+    cases.append({
+        "name": f"chacha write .bin+.txt {bits:,}",
+        "setup": _chacha,
+        "run": lambda prng, n=bits: _write_files(prng, n, directory),
+        "bytes": bits // 8,
+    })
+    return cases
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of values (fraction in [0, 1])
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * fraction // 1))
+    return ordered[int(rank) - 1]
+
+
+def run_case(case, warmup, repeats):
+    """
+    Time one case, return its statistics as a dict
+    """
+    for _ in range(warmup):
+        case["run"](case["setup"]())
+
+    times = []
+    for _ in range(repeats):
+        arg = case["setup"]()
+        start = time.perf_counter()
+        case["run"](arg)
+        times.append(time.perf_counter() - start)
+
+    # Peak memory in a separate run: tracemalloc slows allocation down
+    arg = case["setup"]()
+    tracemalloc.start()
+    case["run"](arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    result = {
+        "repeats": repeats,
+        "median_s": median,
+        "p95_s": percentile(times, 0.95),
+        "min_s": min(times),
+        "mean_s": statistics.mean(times),
+        "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "peak_memory_bytes": peak,
+        "bytes": case["bytes"],
+        "throughput_mb_s": None,
+    }
+    if case["bytes"] and median > 0:
+        result["throughput_mb_s"] = case["bytes"] / 1e6 / median
+    return result
+
+
+def machine_info():
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    from bigint import get_backend
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy_version,
+        "bigint_backend": get_backend().name,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare median times against a baseline report.
+    Returns the names of the cases slower than baseline by more than threshold.
+    """
+    regressions = []
+    print(f"\nComparison against baseline (threshold {threshold:.0%}):\n")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"  {name}: not in baseline")
+            continue
+        ratio = result["median_s"] / baseline[name]["median_s"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"  {name}: {baseline[name]['median_s']:.4f} s -> {result['median_s']:.4f} s ({ratio:.2f}x){flag}")
+    return regressions
+
 
 if __name__ == "__main__":
-    print("Benchmarking PRNG generation times (in seconds):\n")
-
-    for prng in PRNGS:
-        for bits in BIT_SIZES:
-            label = f"{prng['label']} - {bits // 1_000_000} million bits"
-            print(f"Generating with {label}...")
-            if prng["type"] == "chacha":
-                duration = time_chacha(bits)
-            else:
-                duration = time_bbs(bits, prng["prime_size"])
-            print(f"Completed in {duration:.3f} seconds.\n")
-            results.append((prng["label"], bits, duration))
-
-    # Save results to txt file
-    txt_path = "testing/performance_results.txt"
-    with open(txt_path, "w") as f:
-        for row in results:
-            label = f"{row[0]} ({row[1] // 1_000_000}M bits)"
-            f.write(f"{label}: {row[2]:.3f} sec\n")
-
-    print("Benchmark complete.")
-    print(f"Results saved to: {txt_path}")
+    parser = argparse.ArgumentParser(description="Benchmark the PRNGs")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes for a fast check")
+    parser.add_argument("--warmup", type=int, default=WARMUP, help=f"Untimed runs per case (default: {WARMUP})")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help=f"Timed runs per case (default: {REPEATS})")
+    parser.add_argument("--filter", type=str, default=None, help="Only run cases whose name contains this text")
+    parser.add_argument("--json", type=str, default=JSON_PATH, help=f"Results path (default: {JSON_PATH})")
+    parser.add_argument("--compare", type=str, default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help=f"Regression threshold (default: {THRESHOLD})")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        cases = build_cases(args.quick, directory)
+        if args.filter:
+            cases = [case for case in cases if args.filter in case["name"]]
+
+        print(f"Running {len(cases)} benchmarks ({args.warmup} warm-up, {args.repeats} timed runs each):\n")
+        for case in cases:
+            result = run_case(case, args.warmup, args.repeats)
+            results[case["name"]] = result
+            throughput = f", {result['throughput_mb_s']:.2f} MB/s" if result["throughput_mb_s"] else ""
+            print(f"{case['name']}: median {result['median_s']:.4f} s, p95 {result['p95_s']:.4f} s"
+                  f"{throughput}, peak {result['peak_memory_bytes'] / 1e6:.1f} MB")
+
+    with open(args.json, "w") as f:
+        json.dump({"machine": machine_info(), "results": results}, f, indent=2)
+    print(f"\nResults saved to: {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) found.")
+            sys.exit(1)
+        print("\nNo regressions.")
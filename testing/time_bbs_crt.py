@@ -0,0 +1,63 @@
+# File: testing/time_bbs_crt.py
+
+# Compare BBS generation and jump-ahead time with and without the CRT
+# squaring backend for 512 and 1024 bit primes, checking both produce the
+# same bits. Expect no speedup for generation (every bit needs the state
+# recombined) and a clear one for jumps.
+
+import time
+import secrets
+import argparse
+import sys
+sys.path.append("..")
+
+from bbs import BlumBlumShubPRNG
+from primes import generate_blum_prime
+
+PRIME_SIZES = [512, 1024]
+BIT_COUNT = 200_000
+JUMP_COUNT = 100
+
+def time_generation(p, q, seed, bits, use_crt):
+    prng = BlumBlumShubPRNG(p, q, seed, use_crt=use_crt)
+    start = time.perf_counter()
+    output = prng.generate_bits(bits)
+    end = time.perf_counter()
+    return end - start, output
+
+def time_jumps(p, q, seed, jumps, use_crt):
+    prng = BlumBlumShubPRNG(p, q, seed, use_crt=use_crt)
+    start = time.perf_counter()
+    for i in range(jumps):
+        prng.jump(10**12 + i)
+    end = time.perf_counter()
+    return (end - start) / jumps, prng.generate_bytes(8)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time BBS with and without the CRT backend")
+    parser.add_argument("--bits", type=int, default=BIT_COUNT, help="Number of bits per run (default: 200,000)")
+    args = parser.parse_args()
+
+    print(f"Timing BBS, {args.bits:,} bits per run:\n")
+    for size in PRIME_SIZES:
+        p = generate_blum_prime(size)
+        q = generate_blum_prime(size)
+        seed = secrets.randbelow(p * q - 2) + 2
+
+        direct_time, direct_bits = time_generation(p, q, seed, args.bits, use_crt=False)
+        crt_time, crt_bits = time_generation(p, q, seed, args.bits, use_crt=True)
+        if direct_bits != crt_bits:
+            print(f"{size}-bit primes: outputs differ!")
+            sys.exit(1)
+
+        print(f"{size}-bit primes: direct {direct_time:.3f} s, CRT {crt_time:.3f} s, "
+              f"speedup {direct_time / crt_time:.2f}x")
+
+        direct_jump, direct_bytes = time_jumps(p, q, seed, JUMP_COUNT, use_crt=False)
+        crt_jump, crt_bytes = time_jumps(p, q, seed, JUMP_COUNT, use_crt=True)
+        if direct_bytes != crt_bytes:
+            print(f"{size}-bit primes: outputs after jump differ!")
+            sys.exit(1)
+
+        print(f"{size}-bit primes: jump direct {direct_jump * 1e3:.2f} ms, CRT {crt_jump * 1e3:.2f} ms, "
+              f"speedup {direct_jump / crt_jump:.2f}x")
@@ -0,0 +1,49 @@
+# File: testing/time_prime_search.py
+
+# Compare the time to find one Blum prime (prime = 3 mod 4) with
+# generate_blum_prime (nextprime walk) and find_blum_prime (sieve)
+# at 512, 1024 and 2048 bits.
+
+import time
+import argparse
+import statistics
+import sys
+sys.path.append("..")
+
+from bigint import get_backend
+from primes import generate_blum_prime, find_blum_prime, find_blum_prime_pair
+
+PRIME_SIZES = [512, 1024, 2048]
+REPEATS = 5
+
+def time_search(search, bits, repeats, backend):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        search(bits, backend=backend)
+        end = time.perf_counter()
+        times.append(end - start)
+    return statistics.median(times)
+
+def time_pair(bits, repeats, backend, workers):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        find_blum_prime_pair(bits, backend=backend, workers=workers)
+        end = time.perf_counter()
+        times.append(end - start)
+    return statistics.median(times)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time Blum prime search implementations")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="Primes searched per size and method (default: 5)")
+    parser.add_argument("--backend", type=str, default=None, help="Big integer backend: auto, gmpy2 or python")
+    args = parser.parse_args()
+
+    print(f"Median time to find one Blum prime ({get_backend(args.backend).name} backend, {args.repeats} runs):\n")
+    for size in PRIME_SIZES:
+        old_time = time_search(generate_blum_prime, size, args.repeats, args.backend)
+        new_time = time_search(find_blum_prime, size, args.repeats, args.backend)
+        pair_time = time_pair(size, args.repeats, args.backend, workers=2)
+        print(f"{size}-bit: generate_blum_prime {old_time:.3f} s, find_blum_prime {new_time:.3f} s, "
+              f"speedup {old_time / new_time:.2f}x, parallel p/q pair {pair_time:.3f} s")